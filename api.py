@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from enum import Enum
+from typing import Any
+
+from aiohttp import WSMsgType, web
+
+from bazar import Player
+from broadcast import Broadcaster
+from common import Suit
+from tables import Table, TableRegistry
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT = 30  # seconds
+
+# Headless JSON protocol for bots and load-test clients, no DOM or widgets involved.
+# Client sends {"action": "bet", "suit": "SPADES", "amount": 9, "capo": false}, {"action": "pass"},
+# {"action": "contra"} or {"action": "recontra"} and gets {"type": "result", "action": ..., "accepted": ...},
+# when not accepted also "rejected": {"reason": "CONDITION", "conditions": ["is_bet_increased"]}.
+# Server sends {"type": "state", ...} once and then {"type": "delta", "version": ..., ...} with changed keys only.
+# Enums are sent by name, e.g. "SPADES" or "A".
+
+
+def _name(value: Enum | None) -> str | None:
+    return None if value is None else value.name
+
+
+def table_state(table: Table, player: Player | None) -> dict[str, Any]:
+    with table.lock:
+        memory = table.fsm.memory
+        state = {
+            "version": table.version,
+            "state": table.fsm.current_state.name,
+            "current_player": _name(memory.current_player),
+            "pass_count": memory.pass_count,
+            "last_bet_player": _name(memory.last_bet_player),
+            "last_bet_suit": _name(memory.last_bet_suit),
+            "last_bet_amount": memory.last_bet_amount,
+            "capo": memory.capo,
+            "contra": memory.contra,
+            "recontra": memory.recontra,
+            "waiting_player": _name(table.waiting_player),
+            "timer": table.timer is not None,
+        }
+        if player is not None:
+            legal = table.fsm.legal_actions(player)
+            state["legal"] = {
+                "pass": legal.pass_,
+                "min_bet": legal.min_bet,
+                "min_capo_bet": legal.min_capo_bet,
+                "contra": legal.contra,
+                "recontra": legal.recontra,
+            }
+        return state
+
+
+class ApiSession:
+    # One headless connection: a seat at a table, or just watching if player is None,
+    # and the last state sent to the client so only changes go out.
+    def __init__(self, table: Table, player: Player | None) -> None:
+        self.table = table
+        self.player = player
+        self.sent: dict[str, Any] = {}
+
+    def state(self) -> dict[str, Any]:
+        self.sent = table_state(self.table, self.player)
+        return {"type": "state", **self.sent}
+
+    def delta(self) -> dict[str, Any] | None:
+        state = table_state(self.table, self.player)
+        changed = {key: value for key, value in state.items() if self.sent.get(key) != value}
+        if not changed:
+            return None
+        self.sent = state
+        return {"type": "delta", "version": state["version"], **changed}
+
+    def handle(self, message: dict[str, Any]) -> dict[str, Any]:
+        action = message.get("action")
+        if self.player is None:
+            return {"type": "error", "action": action, "error": "not seated"}
+        try:
+            if action == "bet":
+                outcome = self.table.bet(
+                    self.player, Suit[message["suit"]], int(message["amount"]), bool(message.get("capo", False)),
+                )
+            elif action == "pass":
+                outcome = self.table.pass_(self.player)
+            elif action == "contra":
+                outcome = self.table.contra(self.player)
+            elif action == "recontra":
+                outcome = self.table.recontra(self.player)
+            else:
+                return {"type": "error", "action": action, "error": "unknown action"}
+        except (KeyError, TypeError, ValueError) as e:
+            return {"type": "error", "action": action, "error": f"bad message: {e!r}"}
+        reply = {"type": "result", "action": action, "accepted": bool(outcome)}
+        if not outcome:
+            reply["rejected"] = {"reason": outcome.reason.name, "conditions": list(outcome.conditions)}
+        return reply
+
+
+async def serve(request: web.Request,
+                tables: TableRegistry,
+                broadcaster: Broadcaster,
+                table_id: str,
+                player: Player | None) -> web.StreamResponse:
+    # plain GET gets the current state once, websocket gets state and then deltas.
+    # Joining, leaving, actions and state reads run in the default executor: with ShardedTableRegistry
+    # they wait for a worker process, and reads take the table lock an action may hold, neither of
+    # which must stall the event loop.
+    loop = asyncio.get_running_loop()
+    try:
+        table = await loop.run_in_executor(None, tables.join, table_id)
+    except ValueError as e:
+        raise web.HTTPBadRequest(text=str(e))
+    try:
+        session = ApiSession(table, player)
+        if request.headers.get("upgrade", "").lower() != "websocket":
+            return web.json_response(await loop.run_in_executor(None, session.state))
+
+        ws = web.WebSocketResponse(heartbeat=HEARTBEAT)
+        await ws.prepare(request)
+        changed = asyncio.Event()
+
+        def on_table_changed(version: int) -> None:
+            # called from the timer thread
+            loop.call_soon_threadsafe(changed.set)
+
+        broadcaster.subscribe(table.id, on_table_changed)
+        pusher = asyncio.ensure_future(_push(loop, ws, session, changed))
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    data = json.loads(message.data)
+                except ValueError:
+                    await ws.send_json({"type": "error", "error": "invalid json"})
+                    continue
+                if not isinstance(data, dict):
+                    await ws.send_json({"type": "error", "error": "message must be an object"})
+                    continue
+                result = await loop.run_in_executor(None, session.handle, data)
+                await ws.send_json(result)
+                if result.get("accepted"):
+                    changed.set()  # own action: don't wait for the broadcast window
+        finally:
+            pusher.cancel()
+            broadcaster.unsubscribe(table.id, on_table_changed)
+        return ws
+    finally:
+        await loop.run_in_executor(None, tables.leave, table)
+
+
+async def _push(loop: asyncio.AbstractEventLoop,
+                ws: web.WebSocketResponse,
+                session: ApiSession,
+                changed: asyncio.Event) -> None:
+    # the only caller of state and delta on a websocket session, so session.sent has one writer
+    try:
+        await ws.send_json(await loop.run_in_executor(None, session.state))
+        while True:
+            await changed.wait()
+            changed.clear()
+            delta = await loop.run_in_executor(None, session.delta)
+            if delta is not None:
+                await ws.send_json(delta)
+    except ConnectionResetError:
+        pass
+    except Exception:
+        logger.exception("Exception raised while pushing table %r", session.table.id)
@@ -2,9 +2,10 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from enum import Enum, auto
+from typing import Literal
 
 from common import AutoName, Suit
-from fsm import Transition, FSM
+from fsm import Rejection, Rules, Transition, FSM
 
 MIN_BET = 8
 MIN_CAPO_BET = 25
@@ -57,104 +58,100 @@ class State(AutoName):
     PLAY = auto()
 
 
-@dataclass
-class Memory:
-    current_player: Player
-    pass_count: int = 0
-    last_bet_player: Player | None = None
-    last_bet_suit: Suit | None = None
-    last_bet_amount: int | None = None
-    capo: bool = False
+@dataclass(frozen=True)
+class LegalActions:
+    # bets are legal from min amount upwards for every suit, None if not legal at all
+    pass_: bool = False
+    min_bet: int | None = None
+    min_capo_bet: int | None = None
     contra: bool = False
     recontra: bool = False
+    timeout: bool = False
+
+    def can_bet(self, amount: int, capo: bool) -> bool:
+        min_amount = self.min_capo_bet if capo else self.min_bet
+        return min_amount is not None and amount >= min_amount
+
+
+class Memory:
+    # Written out instead of a dataclass: dataclass(slots=True) needs python 3.10.
+    # Every live game has one, slots keep it small.
+    __slots__ = (
+        "current_player", "pass_count", "last_bet_player", "last_bet_suit", "last_bet_amount",
+        "capo", "contra", "recontra",
+    )
+
+    def __init__(self,
+                 current_player: Player,
+                 pass_count: int = 0,
+                 last_bet_player: Player | None = None,
+                 last_bet_suit: Suit | None = None,
+                 last_bet_amount: int | None = None,
+                 capo: bool = False,
+                 contra: bool = False,
+                 recontra: bool = False) -> None:
+        self.current_player = current_player
+        self.pass_count = pass_count
+        self.last_bet_player = last_bet_player
+        self.last_bet_suit = last_bet_suit
+        self.last_bet_amount = last_bet_amount
+        self.capo = capo
+        self.contra = contra
+        self.recontra = recontra
+
+    def _astuple(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._astuple() == other._astuple()
+
+    __hash__ = None  # mutable
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{self.__class__.__qualname__}({fields})"
 
 
 class BazarFSM(FSM[State, Memory, Event, EventData]):
-    def __init__(self, state: State = None, memory: Memory = None):
+    __slots__ = ("_legal_actions", "_legal_actions_revision")
+
+    def __init__(self, state: State = None, memory: Memory = None, compiled: bool = False):
         super().__init__(
             state or State.NO_BET,
             memory or Memory(
                 current_player=Player.A,
             ),
-            [
-                Transition(
-                    Event.BET, State.NO_BET, State.BET,
-                    [is_current_player, is_bet_at_least_8],
-                    [save_bet, reset_pass_count, go_to_next_user],
-                ),
-                Transition(
-                    Event.BET, State.BET, State.BET,
-                    [is_current_player, is_bet_increased],
-                    [save_bet, reset_pass_count, go_to_next_user],
-                ),
-
-                Transition(
-                    Event.CAPO_BET, State.NO_BET, State.CAPO_BET,
-                    [is_current_player, is_bet_at_least_25],
-                    [save_bet, mark_capo_true, reset_pass_count, go_to_next_user],
-                ),
-                Transition(
-                    Event.CAPO_BET, State.BET, State.CAPO_BET,
-                    [is_current_player, is_bet_at_least_25, is_bet_increased],
-                    [save_bet, mark_capo_true, reset_pass_count, go_to_next_user],
-                ),
-                Transition(
-                    Event.CAPO_BET, State.CAPO_BET, State.CAPO_BET,
-                    [is_current_player, is_bet_increased],
-                    [save_bet, reset_pass_count, go_to_next_user],
-                ),
-
-                Transition(
-                    Event.PASS, State.NO_BET, State.NO_BET,
-                    [is_current_player, is_not_4th_pass],
-                    [increment_pass_count, go_to_next_user],
-                ),
-                Transition(
-                    Event.PASS, State.BET, State.BET,
-                    [is_current_player, is_not_4th_pass],
-                    [increment_pass_count, go_to_next_user],
-                ),
-                Transition(
-                    Event.PASS, State.CAPO_BET, State.CAPO_BET,
-                    [is_current_player, is_not_4th_pass],
-                    [increment_pass_count, go_to_next_user],
-                ),
-
-                Transition(
-                    Event.PASS, State.NO_BET, State.REDIAL,
-                    [is_current_player, is_4th_pass],
-                    increment_pass_count,
-                ),
-                Transition(
-                    Event.PASS, State.BET, State.PLAY,
-                    [is_current_player, is_4th_pass],
-                    increment_pass_count,
-                ),
-                Transition(
-                    Event.PASS, State.CAPO_BET, State.PLAY,
-                    [is_current_player, is_4th_pass],
-                    increment_pass_count,
-                ),
-
-                Transition(
-                    Event.CONTRA, State.BET, State.CONTRA,
-                    is_last_bet_from_another_team,
-                    mark_contra_true,
-                ),
-                Transition(
-                    Event.CONTRA, State.CAPO_BET, State.CONTRA,
-                    is_last_bet_from_another_team,
-                    mark_contra_true,
-                ),
-                Transition(
-                    Event.RECONTRA, State.CONTRA, State.PLAY,
-                    is_last_bet_from_same_team,
-                    mark_recontra_true,
-                ),
-                Transition(
-                    Event.TIMEOUT, State.CONTRA, State.PLAY,
-                ),
-            ],
+            RULES,
+            compiled,
+        )
+        self._legal_actions: dict[Player, LegalActions] | None = None  # created by the first query
+        self._legal_actions_revision = self.revision
+
+    def legal_actions(self, player: Player) -> LegalActions:
+        # cached until the next transition
+        if self._legal_actions is None or self._legal_actions_revision != self.revision:
+            self._legal_actions = {}
+            self._legal_actions_revision = self.revision
+        actions = self._legal_actions.get(player)
+        if actions is None:
+            actions = self._legal_actions[player] = self._find_legal_actions(player)
+        return actions
+
+    def _find_legal_actions(self, player: Player) -> LegalActions:
+        # bet conditions are monotonic in amount and don't depend on suit,
+        # so probing the lowest candidate amount is enough
+        last_bet_amount = self.memory.last_bet_amount
+        min_bet = MIN_BET if last_bet_amount is None else max(MIN_BET, last_bet_amount + 1)
+        min_capo_bet = max(MIN_CAPO_BET, min_bet)
+        return LegalActions(
+            pass_=self.can_pass(player),
+            min_bet=min_bet if self.can_bet(player, Suit.NONE, min_bet, False) else None,
+            min_capo_bet=min_capo_bet if self.can_bet(player, Suit.NONE, min_capo_bet, True) else None,
+            contra=self.can_contra(player),
+            recontra=self.can_recontra(player),
+            timeout=self.can_timeout(),
         )
 
     def can_pass(self, player: Player) -> bool:
@@ -163,6 +160,9 @@ class BazarFSM(FSM[State, Memory, Event, EventData]):
     def handle_pass(self, player: Player) -> bool:
         return self.handle_event(Event.PASS, EventData(player=player))
 
+    def try_pass(self, player: Player) -> Literal[True] | Rejection[State, Event]:
+        return self.try_handle_event(Event.PASS, EventData(player=player))
+
     def can_bet(self, player: Player, suit: Suit, bet: int, capo: bool) -> bool:
         if capo:
             return self.can_handle_event(Event.CAPO_BET, EventData(player=player, suit=suit, amount=bet))
@@ -175,24 +175,39 @@ class BazarFSM(FSM[State, Memory, Event, EventData]):
         else:
             return self.handle_event(Event.BET, EventData(player=player, suit=suit, amount=bet))
 
+    def try_bet(self, player: Player, suit: Suit, bet: int, capo: bool) -> Literal[True] | Rejection[State, Event]:
+        if capo:
+            return self.try_handle_event(Event.CAPO_BET, EventData(player=player, suit=suit, amount=bet))
+        else:
+            return self.try_handle_event(Event.BET, EventData(player=player, suit=suit, amount=bet))
+
     def can_contra(self, player: Player) -> bool:
         return self.can_handle_event(Event.CONTRA, EventData(player=player))
 
     def handle_contra(self, player: Player) -> bool:
         return self.handle_event(Event.CONTRA, EventData(player=player))
 
+    def try_contra(self, player: Player) -> Literal[True] | Rejection[State, Event]:
+        return self.try_handle_event(Event.CONTRA, EventData(player=player))
+
     def can_recontra(self, player: Player) -> bool:
         return self.can_handle_event(Event.RECONTRA, EventData(player=player))
 
     def handle_recontra(self, player: Player) -> bool:
         return self.handle_event(Event.RECONTRA, EventData(player=player))
 
+    def try_recontra(self, player: Player) -> Literal[True] | Rejection[State, Event]:
+        return self.try_handle_event(Event.RECONTRA, EventData(player=player))
+
     def can_timeout(self) -> bool:
         return self.can_handle_event(Event.TIMEOUT, EventData())
 
     def handle_timeout(self) -> bool:
         return self.handle_event(Event.TIMEOUT, EventData())
 
+    def try_timeout(self) -> Literal[True] | Rejection[State, Event]:
+        return self.try_handle_event(Event.TIMEOUT, EventData())
+
 
 def is_current_player(state: State, memory: Memory, e: Event, data: EventData) -> bool:
     return memory.current_player == data.player
@@ -261,3 +276,85 @@ def mark_contra_true(from_: State, to: State, memory: Memory, e: Event, d: Event
 
 def mark_recontra_true(from_: State, to: State, memory: Memory, e: Event, d: EventData) -> None:
     memory.recontra = True
+
+
+# built once, shared by every BazarFSM
+RULES: Rules[State, Memory, Event, EventData] = Rules([
+    Transition(
+        Event.BET, State.NO_BET, State.BET,
+        [is_current_player, is_bet_at_least_8],
+        [save_bet, reset_pass_count, go_to_next_user],
+    ),
+    Transition(
+        Event.BET, State.BET, State.BET,
+        [is_current_player, is_bet_increased],
+        [save_bet, reset_pass_count, go_to_next_user],
+    ),
+
+    Transition(
+        Event.CAPO_BET, State.NO_BET, State.CAPO_BET,
+        [is_current_player, is_bet_at_least_25],
+        [save_bet, mark_capo_true, reset_pass_count, go_to_next_user],
+    ),
+    Transition(
+        Event.CAPO_BET, State.BET, State.CAPO_BET,
+        [is_current_player, is_bet_at_least_25, is_bet_increased],
+        [save_bet, mark_capo_true, reset_pass_count, go_to_next_user],
+    ),
+    Transition(
+        Event.CAPO_BET, State.CAPO_BET, State.CAPO_BET,
+        [is_current_player, is_bet_increased],
+        [save_bet, reset_pass_count, go_to_next_user],
+    ),
+
+    Transition(
+        Event.PASS, State.NO_BET, State.NO_BET,
+        [is_current_player, is_not_4th_pass],
+        [increment_pass_count, go_to_next_user],
+    ),
+    Transition(
+        Event.PASS, State.BET, State.BET,
+        [is_current_player, is_not_4th_pass],
+        [increment_pass_count, go_to_next_user],
+    ),
+    Transition(
+        Event.PASS, State.CAPO_BET, State.CAPO_BET,
+        [is_current_player, is_not_4th_pass],
+        [increment_pass_count, go_to_next_user],
+    ),
+
+    Transition(
+        Event.PASS, State.NO_BET, State.REDIAL,
+        [is_current_player, is_4th_pass],
+        increment_pass_count,
+    ),
+    Transition(
+        Event.PASS, State.BET, State.PLAY,
+        [is_current_player, is_4th_pass],
+        increment_pass_count,
+    ),
+    Transition(
+        Event.PASS, State.CAPO_BET, State.PLAY,
+        [is_current_player, is_4th_pass],
+        increment_pass_count,
+    ),
+
+    Transition(
+        Event.CONTRA, State.BET, State.CONTRA,
+        is_last_bet_from_another_team,
+        mark_contra_true,
+    ),
+    Transition(
+        Event.CONTRA, State.CAPO_BET, State.CONTRA,
+        is_last_bet_from_another_team,
+        mark_contra_true,
+    ),
+    Transition(
+        Event.RECONTRA, State.CONTRA, State.PLAY,
+        is_last_bet_from_same_team,
+        mark_recontra_true,
+    ),
+    Transition(
+        Event.TIMEOUT, State.CONTRA, State.PLAY,
+    ),
+])
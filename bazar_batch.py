@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+
+import bazar
+from bazar import BazarFSM, Event, EventData, Memory, Player, State, Team
+from common import Suit
+from fsm import DispatchTable
+
+# Integer codes used in the columns. Optional fields use NONE.
+NONE = -1
+STATE_CODES = {s: i for i, s in enumerate(State)}
+EVENT_CODES = {e: i for i, e in enumerate(Event)}
+PLAYER_CODES = {p: i for i, p in enumerate(Player)}
+SUIT_CODES = {s: i for i, s in enumerate(Suit)}
+_STATES = tuple(State)
+_PLAYERS = tuple(Player)
+_SUITS = tuple(Suit)
+_TEAMS = np.array([list(Team).index(p.team) for p in Player], dtype=np.int8)
+_NEXT_PLAYER = np.array([PLAYER_CODES[p] for p in _PLAYERS[1:] + _PLAYERS[:1]], dtype=np.int8)
+
+
+class BazarBatch:
+    # N independent auctions stored column-wise, one row per game
+    def __init__(self, size: int, first_player: Player = Player.A) -> None:
+        self.size = size
+        self.state = np.full(size, STATE_CODES[State.NO_BET], dtype=np.int8)
+        self.current_player = np.full(size, PLAYER_CODES[first_player], dtype=np.int8)
+        self.pass_count = np.zeros(size, dtype=np.int8)
+        self.last_bet_player = np.full(size, NONE, dtype=np.int8)
+        self.last_bet_suit = np.full(size, NONE, dtype=np.int8)
+        self.last_bet_amount = np.full(size, NONE, dtype=np.int16)
+        self.capo = np.zeros(size, dtype=bool)
+        self.contra = np.zeros(size, dtype=bool)
+        self.recontra = np.zeros(size, dtype=bool)
+
+    @property
+    def terminal(self) -> np.ndarray:
+        return np.isin(self.state, _TERMINAL_STATES)
+
+    def step(self,
+             event: np.ndarray,
+             player: np.ndarray,
+             suit: np.ndarray,
+             amount: np.ndarray) -> np.ndarray:
+        # Applies one event per game, NONE in event means no event for that game.
+        # Returns mask of accepted events, rejected events leave the game untouched.
+        data = _EventColumns(
+            np.asarray(event, dtype=np.int8),
+            np.asarray(player, dtype=np.int8),
+            np.asarray(suit, dtype=np.int8),
+            np.asarray(amount, dtype=np.int16),
+        )
+        state = self.state.copy()  # every game matches against its state before the step
+        accepted = np.zeros(self.size, dtype=bool)
+        for (from_, e), candidates in _RULES.items():
+            pending = (state == from_) & (data.event == e)
+            if not pending.any():
+                continue
+            for conditions, callbacks, to in candidates:
+                mask = pending.copy()
+                for c in conditions:
+                    mask &= c(self, data)
+                if not mask.any():
+                    continue
+                for c in callbacks:
+                    c(self, data, mask)
+                self.state[mask] = to
+                accepted |= mask
+                pending &= ~mask
+        return accepted
+
+    def state_of(self, game: int) -> State:
+        return _STATES[self.state[game]]
+
+    def memory_of(self, game: int) -> Memory:
+        def optional(values: tuple, code: int):
+            return None if code == NONE else values[code]
+
+        return Memory(
+            current_player=_PLAYERS[self.current_player[game]],
+            pass_count=int(self.pass_count[game]),
+            last_bet_player=optional(_PLAYERS, self.last_bet_player[game]),
+            last_bet_suit=optional(_SUITS, self.last_bet_suit[game]),
+            last_bet_amount=None if self.last_bet_amount[game] == NONE else int(self.last_bet_amount[game]),
+            capo=bool(self.capo[game]),
+            contra=bool(self.contra[game]),
+            recontra=bool(self.recontra[game]),
+        )
+
+    def fsm_of(self, game: int) -> BazarFSM:
+        return BazarFSM(self.state_of(game), self.memory_of(game))
+
+
+@dataclass
+class _EventColumns:
+    event: np.ndarray
+    player: np.ndarray
+    suit: np.ndarray
+    amount: np.ndarray
+
+
+def encode_events(events: list[tuple[Event, EventData] | None]) -> tuple[np.ndarray, ...]:
+    # converts per-game events to the columns accepted by BazarBatch.step
+    size = len(events)
+    event = np.full(size, NONE, dtype=np.int8)
+    player = np.full(size, NONE, dtype=np.int8)
+    suit = np.full(size, NONE, dtype=np.int8)
+    amount = np.full(size, NONE, dtype=np.int16)
+    for i, item in enumerate(events):
+        if item is None:
+            continue
+        e, data = item
+        event[i] = EVENT_CODES[e]
+        if data.player is not None:
+            player[i] = PLAYER_CODES[data.player]
+        if data.suit is not None:
+            suit[i] = SUIT_CODES[data.suit]
+        if data.amount is not None:
+            amount[i] = data.amount
+    return event, player, suit, amount
+
+
+# Column-wise counterparts of the bazar rules. Transitions are read from bazar.RULES itself,
+# so a new condition or callback without a counterpart fails at import instead of diverging.
+ColumnCondition = Callable[[BazarBatch, _EventColumns], np.ndarray]
+ColumnCallback = Callable[[BazarBatch, _EventColumns, np.ndarray], None]
+
+def _team(players: np.ndarray) -> np.ndarray:
+    # NONE stays NONE, indexing _TEAMS with it would read the last player's team
+    return np.where(players == NONE, NONE, _TEAMS[players])
+
+
+def _same_team(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # rows missing either player are neither the same nor another team, as the scalar rules never see them
+    a, b = _team(a), _team(b)
+    return (a != NONE) & (a == b)
+
+
+def _another_team(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a, b = _team(a), _team(b)
+    return (a != NONE) & (b != NONE) & (a != b)
+
+
+_CONDITIONS: dict[Callable, ColumnCondition] = {
+    bazar.is_current_player: lambda b, d: b.current_player == d.player,
+    bazar.is_bet_at_least_8: lambda b, d: d.amount >= bazar.MIN_BET,
+    bazar.is_bet_at_least_25: lambda b, d: d.amount >= bazar.MIN_CAPO_BET,
+    bazar.is_bet_increased: lambda b, d: d.amount > b.last_bet_amount,
+    bazar.is_4th_pass: lambda b, d: b.pass_count + 1 == 4,  # +1 from incoming event
+    bazar.is_not_4th_pass: lambda b, d: b.pass_count + 1 < 4,  # +1 from incoming event
+    bazar.is_last_bet_from_same_team: lambda b, d: _same_team(b.last_bet_player, d.player),
+    bazar.is_last_bet_from_another_team: lambda b, d: _another_team(b.last_bet_player, d.player),
+}
+
+
+def _save_bet(b: BazarBatch, d: _EventColumns, mask: np.ndarray) -> None:
+    b.last_bet_player[mask] = d.player[mask]
+    b.last_bet_suit[mask] = d.suit[mask]
+    b.last_bet_amount[mask] = d.amount[mask]
+
+
+def _go_to_next_user(b: BazarBatch, d: _EventColumns, mask: np.ndarray) -> None:
+    b.current_player[mask] = _NEXT_PLAYER[b.current_player[mask]]
+
+
+def _set(column: str, value) -> ColumnCallback:
+    def callback(b: BazarBatch, d: _EventColumns, mask: np.ndarray) -> None:
+        getattr(b, column)[mask] = value
+
+    return callback
+
+
+def _increment_pass_count(b: BazarBatch, d: _EventColumns, mask: np.ndarray) -> None:
+    b.pass_count[mask] += 1
+
+
+_CALLBACKS: dict[Callable, ColumnCallback] = {
+    bazar.save_bet: _save_bet,
+    bazar.go_to_next_user: _go_to_next_user,
+    bazar.increment_pass_count: _increment_pass_count,
+    bazar.reset_pass_count: _set("pass_count", 0),
+    bazar.mark_capo_true: _set("capo", True),
+    bazar.mark_contra_true: _set("contra", True),
+    bazar.mark_recontra_true: _set("recontra", True),
+}
+
+
+ColumnRule = tuple[tuple[ColumnCondition, ...], tuple[ColumnCallback, ...], int]
+
+
+def _compile_rules(table: DispatchTable) -> dict[tuple[int, int], list[ColumnRule]]:
+    rules = {}
+    for state, state_id in table.state_ids.items():
+        row = table.rows[state_id]
+        if row is None:
+            continue
+        for event, event_id in table.event_ids.items():
+            if row[event_id] is None:
+                continue
+            rules[STATE_CODES[state], EVENT_CODES[event]] = [
+                (
+                    tuple(_CONDITIONS[c] for c in conditions),
+                    tuple(_CALLBACKS[c] for c in callbacks),
+                    STATE_CODES[to],
+                )
+                for conditions, callbacks, to, _ in row[event_id]
+            ]
+    return rules
+
+
+_TABLE = bazar.RULES.dispatch_table
+_RULES = _compile_rules(_TABLE)
+_TERMINAL_STATES = np.array([STATE_CODES[s] for s in State if _TABLE.row(s) is None], dtype=np.int8)
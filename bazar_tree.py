@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import argparse
+from collections import Counter
+from dataclasses import dataclass
+
+import codec
+from bazar import BazarFSM, Event, EventData, Memory, Player, State, MIN_BET, MIN_CAPO_BET
+from common import Suit
+
+DEFAULT_MAX_BET = 30
+
+
+@dataclass(frozen=True)
+class Outcome:
+    state: State
+    capo: bool = False
+    contra: bool = False
+    recontra: bool = False
+
+
+class GameTree:
+    # Positions are packed with codec, so the transposition table is a plain dict keyed by int
+    # and every shared sub-tree is expanded only once.
+    def __init__(self, max_bet: int = DEFAULT_MAX_BET) -> None:
+        if max_bet < MIN_BET:
+            raise ValueError(f"max bet can't be less than min bet ({max_bet} < {MIN_BET})")
+        self.max_bet = max_bet
+        self.table: dict[int, dict[Outcome, int]] = {}
+        self._fsm = BazarFSM(compiled=True)
+        # event data is never mutated by the rules, so candidates are built once and reused
+        self._candidates: dict[Event, list[EventData]] = {
+            Event.PASS: [EventData(player=p) for p in Player],
+            Event.BET: [
+                EventData(player=p, suit=s, amount=a)
+                for p in Player for s in Suit for a in range(MIN_BET, max_bet + 1)
+            ],
+            Event.CAPO_BET: [
+                EventData(player=p, suit=s, amount=a)
+                for p in Player for s in Suit for a in range(MIN_CAPO_BET, max_bet + 1)
+            ],
+            Event.CONTRA: [EventData(player=p) for p in Player],
+            Event.RECONTRA: [EventData(player=p) for p in Player],
+            Event.TIMEOUT: [EventData()],
+        }
+
+    def successors(self, code: int) -> Counter[int]:
+        # child position -> number of distinct events leading to it
+        fsm = self._fsm
+        state = codec.unpack_into(code, fsm.memory)
+        fsm.current_state = state
+        row = fsm.dispatch_table.row(state)
+        children: Counter[int] = Counter()
+        if row is None:
+            return children
+        for event, candidates in self._candidates.items():
+            event_id = fsm.dispatch_table.event_ids[event]
+            if row[event_id] is None:
+                continue
+            for data in candidates:
+                if fsm.can_handle_event(event, data):
+                    fsm.handle_event(event, data)
+                    children[codec.pack_fsm(fsm)] += 1
+                    codec.unpack_into(code, fsm.memory)
+                    fsm.current_state = state
+        return children
+
+    def outcomes(self, code: int) -> dict[Outcome, int]:
+        # iterative post-order walk, auctions are too deep for recursion at realistic caps
+        stack = [code]
+        pending: dict[int, Counter[int]] = {}
+        while stack:
+            current = stack[-1]
+            if current in self.table:
+                stack.pop()
+                continue
+            children = pending.get(current)
+            if children is None:
+                children = pending[current] = self.successors(current)
+            missing = [c for c in children if c not in self.table]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            del pending[current]
+            self.table[current] = self._merge(current, children)
+        return self.table[code]
+
+    def _merge(self, code: int, children: Counter[int]) -> dict[Outcome, int]:
+        if not children:
+            state, memory = codec.unpack(code)
+            if self._fsm.dispatch_table.row(state) is not None:
+                return {}  # dead end, no sequence finishes here
+            return {Outcome(state, memory.capo, memory.contra, memory.recontra): 1}
+        total: Counter[Outcome] = Counter()
+        for child, multiplicity in children.items():
+            for outcome, count in self.table[child].items():
+                total[outcome] += count * multiplicity
+        return dict(total)
+
+
+def enumerate_outcomes(max_bet: int = DEFAULT_MAX_BET,
+                       state: State = State.NO_BET,
+                       memory: Memory = None) -> dict[Outcome, int]:
+    tree = GameTree(max_bet)
+    return tree.outcomes(codec.pack(state, memory or Memory(current_player=Player.A)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Count every auction sequence of BazarFSM by terminal outcome")
+    parser.add_argument("--max-bet", type=int, default=DEFAULT_MAX_BET)
+    args = parser.parse_args()
+
+    tree = GameTree(args.max_bet)
+    outcomes = tree.outcomes(codec.pack(State.NO_BET, Memory(current_player=Player.A)))
+
+    def key(item: tuple[Outcome, int]) -> tuple:
+        outcome = item[0]
+        return outcome.state.value, outcome.capo, outcome.contra, outcome.recontra
+
+    for outcome, count in sorted(outcomes.items(), key=key):
+        print(f"{outcome.state.value:8} capo={outcome.capo!s:5} contra={outcome.contra!s:5} "
+              f"recontra={outcome.recontra!s:5} {count}")
+    print(f"sequences: {sum(outcomes.values())}, positions: {len(tree.table)}")
+
+
+if __name__ == "__main__":
+    main()
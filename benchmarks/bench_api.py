@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+
+from lona.html import HTML, Div
+
+from api import ApiSession
+from bazar import Player
+from common import Location, Suit
+from tables import TableRegistry
+from timers import TimerWheel, ManualClock
+from widgets.bet_widget import BetWidget
+from widgets.player_widget import PlayerWidget
+
+
+def widget_tree() -> HTML:
+    # what every MultiplayerBazarView builds for its connection
+    return HTML(Div(
+        *(PlayerWidget(p.value, location) for p, location in zip(Player, Location)),
+        BetWidget(10),
+    ))
+
+
+def allocated(build, n: int) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [build(i) for i in range(n)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) // n
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per connection memory and update cost of headless api sessions")
+    parser.add_argument("--connections", type=int, default=2000)
+    args = parser.parse_args()
+
+    registry = TableRegistry(TimerWheel(clock=ManualClock()))
+    table = registry.get("bench")
+    players = list(Player)
+
+    def session(i: int) -> ApiSession:
+        s = ApiSession(table, players[i % 4])
+        s.state()
+        return s
+
+    print(f"api session: {allocated(session, args.connections):8,d} bytes per connection")
+    print(f"view widgets: {allocated(lambda i: widget_tree(), args.connections):8,d} bytes per connection")
+
+    sessions = [session(i) for i in range(args.connections)]
+    table.bet(Player.A, Suit.SPADES, 8, False)
+    start = time.perf_counter()
+    sent = sum(s.delta() is not None for s in sessions)
+    elapsed = time.perf_counter() - start
+    print(f"delta: {elapsed / args.connections * 1e6:.1f} us per connection, {sent} deltas sent")
+
+
+if __name__ == "__main__":
+    main()
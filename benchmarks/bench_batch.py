@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from bazar import BazarFSM
+from bazar_batch import BazarBatch, encode_events
+from benchmarks.bench_fsm import random_auction
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="BazarBatch events per second against one BazarFSM per game")
+    parser.add_argument("--auctions", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    auctions = [random_auction(rng) for _ in range(args.auctions)]
+    # random auctions are legal, so mix in shuffled events to exercise rejections too
+    steps = max(map(len, auctions))
+    scripts = [
+        [a[i] if i < len(a) and rng.random() < 0.9 else rng.choice(a) for i in range(steps)]
+        for a in auctions
+    ]
+    columns = [encode_events([s[i] for s in scripts]) for i in range(steps)]
+    events = args.auctions * steps
+
+    fsms = [BazarFSM(compiled=True) for _ in scripts]
+    start = time.perf_counter()
+    expected = np.zeros((steps, args.auctions), dtype=bool)
+    for g, (fsm, script) in enumerate(zip(fsms, scripts)):
+        for i, (event, data) in enumerate(script):
+            if fsm.can_handle_event(event, data):
+                fsm.handle_event(event, data)
+                expected[i, g] = True
+    fsm_time = time.perf_counter() - start
+
+    batch = BazarBatch(args.auctions)
+    start = time.perf_counter()
+    accepted = np.array([batch.step(*c) for c in columns])
+    batch_time = time.perf_counter() - start
+
+    if not (accepted == expected).all():
+        raise RuntimeError("BazarBatch acceptance diverged from BazarFSM")
+    for g, fsm in enumerate(fsms):
+        if (batch.state_of(g), batch.memory_of(g)) != (fsm.current_state, fsm.memory):
+            raise RuntimeError(f"BazarBatch state diverged from BazarFSM in game {g}")
+
+    print(f"games: {args.auctions}, events: {events}, accepted: {int(accepted.sum())}")
+    print(f"BazarFSM:   {events / fsm_time:12,.0f} events/s")
+    print(f"BazarBatch: {events / batch_time:12,.0f} events/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+from bazar import Player
+from bot import DECISION_TIME, BiddingBot, BotSeat
+from broadcast import Broadcaster
+from hand_strength import HandStrengths
+from metrics import BotMetrics
+from tables import TableRegistry
+from timers import TimerWheel
+
+
+class TimedBot(BiddingBot):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.latencies: list[float] = []
+
+    def decide(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().decide(*args, **kwargs)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Auctions played by bot seats only, decision latency and rollouts")
+    parser.add_argument("--tables", type=int, default=2)
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--decision-time", type=float, default=DECISION_TIME)
+    parser.add_argument("--strengths", type=Path, help="hand strength table, bets only in the strongest suits")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds the auctions may take")
+    args = parser.parse_args()
+
+    timers = TimerWheel()
+    broadcaster = Broadcaster(timers)
+    registry = TableRegistry(timers, on_change=broadcaster.publish)
+    metrics = BotMetrics()
+    strengths = args.strengths and HandStrengths.load(args.strengths)
+    bot = TimedBot(args.processes, args.decision_time, metrics, strengths)
+    timers.start()
+
+    start = time.perf_counter()
+    seats = [BotSeat(bot, registry, broadcaster, f"bots-{i}", player)
+             for i in range(args.tables) for player in Player]
+    tables = [registry.get(f"bots-{i}") for i in range(args.tables)]
+    while time.perf_counter() - start < args.timeout and not all(t.fsm.is_terminal for t in tables):
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+    for seat in seats:
+        seat.close()
+    bot.close()
+    timers.stop()
+
+    finished = sum(t.fsm.is_terminal for t in tables)
+    latencies = sorted(bot.latencies)
+    print(f"auctions: {finished} of {args.tables} finished in {elapsed:.1f}s, "
+          f"{args.tables * len(Player)} seats on {args.processes} processes")
+    print("actions: " + ", ".join(f"{'WAIT' if e is None else e.name} {n}" for e, n in metrics.decisions.most_common()))
+    if latencies:
+        print(f"decisions: {len(latencies)}, p50 {statistics.median(latencies) * 1e3:.0f} ms, "
+              f"max {latencies[-1] * 1e3:.0f} ms, limit {args.decision_time * 1e3:.0f} ms")
+        print(f"rollouts: {metrics.rollouts:,d}, {metrics.rollouts / sum(latencies):,.0f}/s while deciding")
+    for t in tables:
+        print(f"  {t.id}: {t.fsm.current_state.name} {t.fsm.memory.last_bet_player} "
+              f"{t.fsm.memory.last_bet_suit} {t.fsm.memory.last_bet_amount}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from bazar import BazarFSM, Event, EventData, Player, MIN_BET, MIN_CAPO_BET
+from common import Suit
+
+
+def random_auction(rng: random.Random) -> list[tuple[Event, EventData]]:
+    fsm = BazarFSM()
+    events = []
+    while True:
+        player = fsm.memory.current_player
+        last = fsm.memory.last_bet_amount
+        bet = max(MIN_BET, last + 1 if last is not None else MIN_BET) + rng.randrange(3)
+        candidates = [
+            (Event.PASS, EventData(player=player)),
+            (Event.PASS, EventData(player=player)),
+            (Event.BET, EventData(player=player, suit=rng.choice(list(Suit)), amount=bet)),
+            (Event.CAPO_BET, EventData(player=player, suit=rng.choice(list(Suit)), amount=max(bet, MIN_CAPO_BET))),
+            (Event.CONTRA, EventData(player=rng.choice(list(Player)))),
+            (Event.RECONTRA, EventData(player=rng.choice(list(Player)))),
+            (Event.TIMEOUT, EventData()),
+        ]
+        legal = [c for c in candidates if fsm.can_handle_event(*c)]
+        event, data = rng.choice(legal)
+        events.append((event, data))
+        if not fsm.handle_event(event, data):
+            return events
+
+
+def run(auctions: list[list[tuple[Event, EventData]]], compiled: bool) -> tuple[float, list]:
+    # construction is measured separately, here only event dispatch counts
+    fsms = [BazarFSM(compiled=compiled) for _ in auctions]
+    start = time.perf_counter()
+    for fsm, auction in zip(fsms, auctions):
+        for event, data in auction:
+            fsm.can_handle_event(event, data)
+            fsm.handle_event(event, data)
+    elapsed = time.perf_counter() - start
+    return elapsed, [(fsm.current_state, fsm.memory) for fsm in fsms]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="BazarFSM events per second, plain vs compiled dispatch")
+    parser.add_argument("--auctions", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    auctions = [random_auction(rng) for _ in range(args.auctions)]
+    events = sum(map(len, auctions))
+
+    plain_time, plain_results = run(auctions, compiled=False)
+    compiled_time, compiled_results = run(auctions, compiled=True)
+    if plain_results != compiled_results:
+        raise RuntimeError("compiled FSM diverged from plain FSM")
+
+    print(f"auctions: {args.auctions}, events: {events}")
+    print(f"plain:    {events / plain_time:12,.0f} events/s")
+    print(f"compiled: {events / compiled_time:12,.0f} events/s")
+    print(f"speedup:  {plain_time / compiled_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+from threading import Thread
+
+from benchmarks.bench_fsm import random_auction
+from journal import Journal
+from bazar import Event, EventData
+from tables import Table, TableRegistry
+from timers import TimerWheel, ManualClock
+
+
+def play(tables: list[Table], auctions: list[list[tuple[Event, EventData]]]) -> None:
+    for table, auction in zip(tables, auctions):
+        for event, data in auction:
+            with table.lock:
+                table._apply_under_lock(event, data)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Journal write throughput under many tables and recovery time")
+    parser.add_argument("--tables", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--snapshot-every", type=float, default=1.0, help="seconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        journal = Journal(directory)
+        registry = TableRegistry(TimerWheel(clock=ManualClock()), journal=journal)
+        journal.start(registry.values, args.snapshot_every)
+
+        rng = random.Random(0)
+        auctions = [random_auction(rng) for _ in range(args.tables)]
+        tables = [registry.get(str(i)) for i in range(args.tables)]
+        threads = [
+            Thread(target=play, args=(tables[i::args.threads], auctions[i::args.threads]))
+            for i in range(args.threads)
+        ]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        journal.close()
+        elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        recovered = Journal(directory).recover()
+        recovery = time.perf_counter() - start
+
+        for table in registry.values():
+            version, fsm = recovered[table.id]
+            if (version, fsm.current_state, fsm.memory) != (table.version, table.fsm.current_state, table.fsm.memory):
+                raise RuntimeError(f"table {table.id} recovered differently")
+
+        print(f"tables: {args.tables}, threads: {args.threads}, records: {journal.appended}, fsyncs: {journal.fsyncs}")
+        print(f"append:   {journal.appended / elapsed:12,.0f} records/s")
+        print(f"recovery: {recovery:.3f}s for {len(recovered)} tables")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from play import (
+    CARDS, FULL_DECK, LAST_TRICK_BONUS, NO_TRUMP, RANKS, SUITS, TrickPlay, cards_of, deal, legal_cards, points,
+)
+
+TRUMP_ORDER = ("7", "8", "Q", "K", "10", "A", "9", "J")
+
+
+def beats(c: int, best: int, trump: int) -> bool:
+    if c // 8 == best // 8:
+        order = TRUMP_ORDER if c // 8 == trump else RANKS
+        return order.index(RANKS[c % 8]) > order.index(RANKS[best % 8])
+    return c // 8 == trump
+
+
+def legal_cards_scan(hand: list[int], trick: list[int], trump: int) -> list[int]:
+    # the same rules over card lists, what the bitboard version replaces
+    if not trick:
+        return hand
+    led = trick[0] // 8
+    best = trick[0]
+    for c in trick[1:]:
+        if beats(c, best, trump):
+            best = c
+    follow = [c for c in hand if c // 8 == led]
+    if trump == NO_TRUMP:
+        return follow or hand
+    trumps = [c for c in hand if c // 8 == trump]
+    higher = [c for c in trumps if beats(c, best, trump)]
+    if led == trump:
+        return [c for c in follow if c in higher] or follow or hand
+    if follow:
+        return follow
+    if not trumps:
+        return hand
+    if best // 8 == trump:
+        return higher or trumps
+    return trumps
+
+
+def random_positions(rng: random.Random, deals: int) -> list[tuple[int, int, int, int, list[int], list[int]]]:
+    # (hand, led, best, trump, hand as list, trick as list) for every card played in random games
+    positions = []
+    for _ in range(deals):
+        trump = rng.randrange(NO_TRUMP, len(SUITS))
+        game = TrickPlay(deal(rng), trump, rng.randrange(4))
+        while not game.is_over:
+            trick = game.history[len(game.history) & ~3:]
+            hand = game.hands[game.seat]
+            positions.append((hand, game.led, game.best, trump, cards_of(hand), trick))
+            game.play(rng.choice(cards_of(game.legal_cards())))
+        assert sum(game.team_points) == points(FULL_DECK, trump) + LAST_TRICK_BONUS
+    return positions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Legal card generation per second, bitboards against card lists")
+    parser.add_argument("--deals", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    positions = random_positions(rng, args.deals)
+    for hand, led, best, trump, hand_list, trick in positions:
+        assert legal_cards(hand, led, best, trump) == sum(1 << c for c in legal_cards_scan(hand_list, trick, trump))
+
+    start = time.perf_counter()
+    for hand, led, best, trump, _, _ in positions:
+        legal_cards(hand, led, best, trump)
+    bitboard = len(positions) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _, _, _, trump, hand_list, trick in positions:
+        legal_cards_scan(hand_list, trick, trump)
+    scan = len(positions) / (time.perf_counter() - start)
+
+    games = [(deal(rng), rng.randrange(NO_TRUMP, len(SUITS))) for _ in range(args.deals)]
+    start = time.perf_counter()
+    for hands, trump in games:
+        game = TrickPlay(hands, trump)
+        while not game.is_over:
+            legal = game.legal_cards()
+            game.play((legal & -legal).bit_length() - 1)  # lowest legal card
+    played = len(games) / (time.perf_counter() - start)
+
+    print(f"positions: {len(positions)} from {args.deals} random deals of {CARDS} cards")
+    print(f"bitboard:   {bitboard:12,.0f} legal card sets/s")
+    print(f"card lists: {scan:12,.0f} legal card sets/s")
+    print(f"speedup:    {bitboard / scan:.1f}x")
+    print(f"games:      {played:12,.0f} deals played out/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.bench_fsm import random_auction
+from replay import replay_files, write_recording
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay throughput of recorded auctions")
+    parser.add_argument("--auctions", type=int, default=100000)
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = [os.path.join(directory, f"recording-{i}.bin") for i in range(args.files)]
+        files = [open(p, "wb") for p in paths]
+        for i in range(args.auctions):
+            write_recording(files[i % args.files], str(i), random_auction(rng))
+        for f in files:
+            f.close()
+
+        for processes in sorted({1, args.processes}):
+            start = time.perf_counter()
+            report = replay_files(paths, processes)
+            elapsed = time.perf_counter() - start
+            if report.mismatches or report.auctions != args.auctions:
+                raise RuntimeError(f"replay diverged from recording: {report.mismatches[:3]}")
+            print(f"processes: {processes:2}, auctions: {report.auctions}, events: {report.events}, "
+                  f"{report.auctions / elapsed * 60:14,.0f} auctions/min")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from bazar import BazarFSM, State
+from benchmarks.bench_fsm import random_auction
+from play import TrickPlay, cards_of, deal, trump_code
+from scoring import encode_memories, score_batch, score_deal
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Deals scored per second, one score_deal call per deal against score_batch")
+    parser.add_argument("--deals", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    memories, plays = [], []
+    for _ in range(args.deals):
+        fsm = BazarFSM(compiled=True)
+        for event, data in random_auction(rng):
+            fsm.handle_event(event, data)
+        play = TrickPlay(deal(rng), trump_code(fsm.memory.last_bet_suit))
+        while fsm.current_state == State.PLAY and not play.is_over:  # a redial isn't played
+            play.play(rng.choice(cards_of(play.legal_cards())))
+        memories.append(fsm.memory)
+        plays.append(play)
+
+    start = time.perf_counter()
+    expected = [score_deal(memory, play.team_points, play.team_tricks) for memory, play in zip(memories, plays)]
+    scalar = args.deals / (time.perf_counter() - start)
+
+    columns = encode_memories(memories)
+    team_points = np.array([p.team_points for p in plays], dtype=np.int32)
+    team_tricks = np.array([p.team_tricks for p in plays], dtype=np.int32)
+    start = time.perf_counter()
+    made, scores = score_batch(*columns, team_points, team_tricks)
+    batch = args.deals / (time.perf_counter() - start)
+
+    assert [bool(m) for m in made] == [bool(s.made) for s in expected]
+    assert scores.tolist() == [list(s.scores) for s in expected]
+    contracts = sum(s.made is not None for s in expected)
+    print(f"deals: {args.deals}, contracts: {contracts}, made: {int(made.sum())}")
+    print(f"score_deal:  {scalar:14,.0f} deals/s")
+    print(f"score_batch: {batch:14,.0f} deals/s")
+    print(f"speedup: {batch / scalar:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
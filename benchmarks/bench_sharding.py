@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import time
+
+from bazar import Event, EventData
+from benchmarks.bench_fsm import random_auction
+from sharding import ShardedTableRegistry
+from tables import TableRegistry
+from timers import TimerWheel, ManualClock
+
+
+def action(event: Event, data: EventData) -> tuple:
+    if event in (Event.BET, Event.CAPO_BET):
+        return "bet", data.player, data.suit, data.amount, event == Event.CAPO_BET
+    return {Event.PASS: "pass_", Event.CONTRA: "contra", Event.RECONTRA: "recontra"}[event], data.player
+
+
+def scripts(auctions: int, seed: int) -> list[list[tuple]]:
+    # the recontra timeout belongs to the worker's timer, a script stops right before it
+    rng = random.Random(seed)
+    return [
+        [action(event, data) for event, data in random_auction(rng) if event != Event.TIMEOUT]
+        for _ in range(auctions)
+    ]
+
+
+def run_in_process(tables: list[list[tuple]]) -> float:
+    registry = TableRegistry(TimerWheel(clock=ManualClock()))
+    start = time.perf_counter()
+    for i, script in enumerate(tables):
+        table = registry.get(str(i))
+        for method, *args in script:
+            if not getattr(table, method)(*args):
+                raise RuntimeError(f"table {i} rejected {method}")
+    return time.perf_counter() - start
+
+
+def run_sharded(tables: list[list[tuple]], workers: int, in_flight: int) -> float:
+    # the front keeps in_flight auctions going at once, one outstanding action per table
+    registry = ShardedTableRegistry(workers)
+    try:
+        start = time.perf_counter()
+        for first in range(0, len(tables), in_flight):
+            batch = list(enumerate(tables[first:first + in_flight], first))
+            step = 0
+            while batch:
+                futures = [
+                    (i, registry.call_async(str(i), script[step][0], *script[step][1:]))
+                    for i, script in batch
+                ]
+                for i, future in futures:
+                    if future.result() is not True:
+                        raise RuntimeError(f"table {i} rejected {tables[i][step][0]}")
+                step += 1
+                batch = [(i, script) for i, script in batch if step < len(script)]
+        return time.perf_counter() - start
+    finally:
+        registry.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Auctions per second with tables sharded over worker processes")
+    parser.add_argument("--tables", type=int, default=20000)
+    parser.add_argument("--in-flight", type=int, default=1000, help="auctions played at once")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()])
+    args = parser.parse_args()
+
+    tables = scripts(args.tables, seed=0)
+    events = sum(map(len, tables))
+    print(f"tables: {args.tables}, events: {events}")
+    elapsed = run_in_process(tables)
+    print(f"in process: {args.tables / elapsed:10,.0f} tables/s {events / elapsed:12,.0f} events/s")
+    for workers in sorted(set(args.workers)):
+        elapsed = run_sharded(tables, workers, args.in_flight)
+        print(f"{workers:3d} workers: {args.tables / elapsed:10,.0f} tables/s {events / elapsed:12,.0f} events/s")
+
+
+if __name__ == "__main__":
+    main()
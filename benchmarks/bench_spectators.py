@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import argparse
+import time
+
+from broadcast import Broadcaster
+from common import Suit
+from spectators import SpectatorHub, TableDisplay, display_of
+from tables import TableRegistry
+from timers import TimerWheel, ManualClock
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cost of one table change for many spectators")
+    parser.add_argument("--spectators", type=int, nargs="+", default=[1, 100, 1000])
+    parser.add_argument("--changes", type=int, default=200)
+    args = parser.parse_args()
+
+    for spectators in args.spectators:
+        timers = TimerWheel(clock=ManualClock())
+        broadcaster = Broadcaster(timers)
+        registry = TableRegistry(timers, on_change=broadcaster.publish)
+        hub = SpectatorHub(registry, broadcaster)
+        received = []
+
+        def watcher(display: TableDisplay) -> None:
+            received.append(display)
+
+        # distinct watchers, like one bound method per view
+        watchers = [lambda display: watcher(display) for _ in range(spectators)]
+        for w in watchers:
+            hub.watch("bench", w)
+        table = registry.get("bench")
+
+        hub_time = own_time = 0.0
+        for i in range(args.changes):
+            player = table.fsm.memory.current_player
+            if not table.bet(player, Suit.SPADES, 8 + i, False):
+                raise RuntimeError("bet rejected")
+            start = time.perf_counter()
+            broadcaster.flush()
+            hub_time += time.perf_counter() - start
+            # what it costs if every spectator derives the display on its own
+            start = time.perf_counter()
+            for _ in range(spectators):
+                display_of(table)
+            own_time += time.perf_counter() - start
+
+        assert len(received) == spectators * args.changes
+        print(f"{spectators:5d} spectators: {hub.built - 1} displays built for {args.changes} changes, "
+              f"{hub_time / args.changes * 1e6:8.1f} us per change with hub, "
+              f"{own_time / args.changes * 1e6:8.1f} us building per spectator")
+        for w in watchers:
+            hub.unwatch("bench", w)
+        assert registry.get("bench").viewers == 0
+
+
+if __name__ == "__main__":
+    main()
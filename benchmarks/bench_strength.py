@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from hand_strength import HANDS, HandStrengths, build, strength
+from play import NO_TRUMP, SUITS, deal
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Hand strength lookups in the mapped table against computing them")
+    parser.add_argument("--hands", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "hand_strength.bin"
+        start = time.perf_counter()
+        build(path)
+        built = time.perf_counter() - start
+        start = time.perf_counter()
+        table = HandStrengths.load(path)
+        loaded = time.perf_counter() - start
+
+        rng = random.Random(args.seed)
+        hands = [deal(rng)[0] for _ in range(args.hands)]
+        trumps = range(NO_TRUMP, len(SUITS))
+        for hand in hands[:10000]:
+            row = table.row(hand)
+            assert all(row[trump] == strength(hand, trump) for trump in trumps)
+
+        start = time.perf_counter()
+        for hand in hands:
+            table.row(hand)
+        looked_up = len(hands) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for hand in hands:
+            [strength(hand, trump) for trump in trumps]
+        computed = len(hands) / (time.perf_counter() - start)
+
+        print(f"table:    {HANDS:,d} hands, {path.stat().st_size / 2 ** 20:.1f} MiB, "
+              f"built in {built:.1f}s, mapped in {loaded * 1e3:.2f} ms")
+        print(f"lookup:   {looked_up:12,.0f} hands/s, every trump")
+        print(f"computed: {computed:12,.0f} hands/s, every trump")
+        print(f"speedup:  {looked_up / computed:.1f}x")
+        del table
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from collections import Counter
+from threading import Barrier, Lock, Thread
+
+from bazar import Player, MIN_BET
+from common import Suit
+from tables import TableRegistry
+from timers import TimerWheel, ManualClock
+
+
+def table_id(slot: int, game: int) -> str:
+    return str(slot) if game == 0 else f"{slot}.{game}"
+
+
+class Slots:
+    # The table each slot currently plays at. A finished table only rejects, so the first thread to
+    # see it moves the slot on to a fresh one and the load stays on the accepting path.
+    def __init__(self, tables: int) -> None:
+        self.ids = [table_id(slot, 0) for slot in range(tables)]
+        self.games = [0] * tables
+        self.lock = Lock()
+
+    def replace(self, slot: int, finished: str) -> None:
+        with self.lock:
+            if self.ids[slot] == finished:
+                self.games[slot] += 1
+                self.ids[slot] = table_id(slot, self.games[slot])
+
+    def all_ids(self) -> list[str]:
+        return [table_id(slot, game) for slot, games in enumerate(self.games) for game in range(games + 1)]
+
+
+def worker(registry: TableRegistry,
+           slots: Slots,
+           events: int,
+           seed: int,
+           barrier: Barrier,
+           accepted: list[Counter[str]],
+           rejected: list[int]) -> None:
+    rng = random.Random(seed)
+    said: Counter[str] = Counter()
+    refused = 0
+    barrier.wait()
+    for _ in range(events):
+        slot = rng.randrange(len(slots.ids))
+        table = registry.get(slots.ids[slot])
+        if table.fsm.is_terminal:
+            slots.replace(slot, table.id)
+            table = registry.get(slots.ids[slot])
+        # mostly the right player, racing with other threads for the same seat
+        player = table.fsm.memory.current_player if rng.random() < 0.8 else rng.choice(list(Player))
+        action = rng.randrange(5)
+        if action == 0:
+            last = table.fsm.memory.last_bet_amount
+            amount = (MIN_BET if last is None else last + 1) + rng.randrange(2)
+            ok = table.bet(player, rng.choice(list(Suit)), amount, False)
+        elif action == 1:
+            ok = table.pass_(player)
+        elif action == 2:
+            ok = table.contra(player)
+        elif action == 3:
+            ok = table.recontra(player)
+        else:
+            table.timeout()  # timeouts don't say anything
+            continue
+        if ok:
+            said[table.id] += 1
+        else:
+            refused += 1
+    accepted.append(said)
+    rejected.append(refused)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent events against many tables from many threads")
+    parser.add_argument("--tables", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--events", type=int, default=20000, help="events per thread")
+    args = parser.parse_args()
+
+    registry = TableRegistry(TimerWheel(clock=ManualClock()))
+    slots = Slots(args.tables)
+    barrier = Barrier(args.threads + 1)
+    accepted: list[Counter[str]] = []
+    rejected: list[int] = []
+    threads = [
+        Thread(target=worker, args=(registry, slots, args.events, seed, barrier, accepted, rejected))
+        for seed in range(args.threads)
+    ]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    # every accepted action is said exactly once, a lost update means check and apply interleaved
+    said = sum(accepted, Counter())
+    for table in map(registry.get, slots.all_ids()):
+        if sum(n for _, n in table.player_said.values()) != said[table.id]:
+            raise RuntimeError(f"table {table.id} lost an update")
+
+    # timeouts are neither, most of them find no timer
+    total = args.threads * args.events
+    games = sum(slots.games)
+    print(f"tables: {args.tables}, threads: {args.threads}, events: {total}, finished games: {games}")
+    print(f"throughput: {total / elapsed:12,.0f} events/s")
+    print(f"accepted:   {sum(said.values()) / elapsed:12,.0f} events/s")
+    print(f"rejected:   {sum(rejected) / elapsed:12,.0f} events/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import aiohttp
+
+# Load test of table views over lona's websocket protocol: opens many player tabs against a
+# server in a child process, then bets at every table through the api and waits until every
+# tab of the table got the patch. Tables live in memory, nothing is journaled.
+
+SERVER = """
+import sys
+import main
+port, mode = sys.argv[1:]
+del sys.argv[1:]  # lona parses the command line too
+main.EVENT_DRIVEN_VIEWS = mode == "events"
+main.timers.start()
+main.app.run(port=int(port), log_level="warn")
+"""
+
+PREFIX = "lona:"
+VIEW = 101  # lona protocol methods
+DATA = 203
+OPENING = 50  # tabs opening concurrently
+
+
+def status(pid: int) -> dict[str, str]:
+    lines = Path(f"/proc/{pid}/status").read_text().splitlines()
+    return dict(line.split(":\t", 1) for line in lines if ":\t" in line)
+
+
+class Tab:
+    def __init__(self, table_id: str, player: str) -> None:
+        self.table_id = table_id
+        self.player = player
+        self.ws: aiohttp.ClientWebSocketResponse | None = None
+        self.updates: asyncio.Queue[float] = asyncio.Queue()
+
+    async def open(self, session: aiohttp.ClientSession, base: str, timeout: float) -> bool:
+        url = f"/table/{self.table_id}/player/{self.player}"
+        self.ws = await session.ws_connect(base + url)
+        await self.ws.send_str(PREFIX + json.dumps([1, None, VIEW, [url, None]]))
+        try:
+            await asyncio.wait_for(self._data(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        asyncio.create_task(self._listen())
+        return True
+
+    async def _data(self) -> None:
+        async for message in self.ws:
+            if message.type == aiohttp.WSMsgType.TEXT and json.loads(message.data[len(PREFIX):])[2] == DATA:
+                return
+
+    async def _listen(self) -> None:
+        async for message in self.ws:
+            if message.type == aiohttp.WSMsgType.TEXT and json.loads(message.data[len(PREFIX):])[2] == DATA:
+                self.updates.put_nowait(time.perf_counter())
+
+
+def rss_kib(pid: int) -> int:
+    return int(status(pid)["VmRSS"].split()[0])
+
+
+def wait_until_up(base: str, server: subprocess.Popen) -> None:
+    while server.poll() is None:
+        try:
+            urllib.request.urlopen(base + "/metrics").close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("server exited")
+
+
+async def run(pid: int, base: str, tabs_count: int, timeout: float) -> None:
+    idle = rss_kib(pid)
+    # no limit on connections per session, every tab keeps one
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+        tabs = [Tab(f"load-{i // 4}", "ABCD"[i % 4]) for i in range(tabs_count)]
+        # a few tabs opening at a time, the box should be measured holding tabs, not absorbing a burst
+        opening = asyncio.Semaphore(OPENING)
+
+        async def open_tab(tab: Tab) -> bool:
+            async with opening:
+                return await tab.open(session, base, timeout)
+
+        start = time.perf_counter()
+        opened = await asyncio.gather(*(open_tab(tab) for tab in tabs))
+        elapsed = time.perf_counter() - start
+        live = [tab for tab, ok in zip(tabs, opened) if ok]
+        rss = rss_kib(pid) - idle
+        print(f"tabs opened: {len(live)} of {tabs_count} in {elapsed:.1f}s, server threads: {status(pid)['Threads']}, "
+              f"rss +{rss / 1024:.1f} MiB, {rss * 1024 // max(len(live), 1):,d} bytes per tab")
+
+        # first seat of every table bets, the other tabs of the table are woken by the broadcast
+        by_table: dict[str, list[Tab]] = {}
+        for tab in live:
+            by_table.setdefault(tab.table_id, []).append(tab)
+        latencies = []
+        missed = 0
+        for table_id, table_tabs in by_table.items():
+            async with session.ws_connect(f"{base}/api/table/{table_id}/player/A") as api:
+                await api.receive_json()
+                for tab in table_tabs:
+                    while not tab.updates.empty():
+                        tab.updates.get_nowait()
+                start = time.perf_counter()
+                await api.send_json({"action": "bet", "suit": "SPADES", "amount": 8})
+                for tab in table_tabs:
+                    try:
+                        latencies.append(await asyncio.wait_for(tab.updates.get(), timeout) - start)
+                    except asyncio.TimeoutError:
+                        missed += 1
+        if latencies:
+            latencies.sort()
+            print(f"updates: {len(latencies)} received, {missed} missed, "
+                  f"p50 {statistics.median(latencies) * 1e3:.0f} ms, "
+                  f"p99 {latencies[int(len(latencies) * 0.99) - 1] * 1e3:.0f} ms")
+
+        for tab in tabs:
+            await tab.ws.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent player tabs one server process holds")
+    parser.add_argument("--tabs", type=int, default=400)
+    parser.add_argument("--mode", choices=["events", "parked"], default="events")
+    parser.add_argument("--port", type=int, default=8095)
+    parser.add_argument("--timeout", type=float, default=10, help="seconds a tab may take to open or update")
+    args = parser.parse_args()
+
+    root = Path(__file__).resolve().parent.parent
+    base = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen([sys.executable, "-c", SERVER, str(args.port), args.mode], cwd=root)
+    try:
+        wait_until_up(base, server)
+        print(f"mode: {args.mode}")
+        asyncio.run(run(server.pid, base, args.tabs, args.timeout))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable
+
+from bazar import BazarFSM, Event, EventData, Player
+from benchmarks.bench_fsm import random_auction
+from tables import TableRegistry
+from timers import TimerWheel, ManualClock
+
+# Every case returns operations per second, higher is better. Results are compared against
+# a stored baseline, a case slower than baseline by more than the tolerance is a regression.
+
+BASELINE = Path(__file__).with_name("baseline.json")
+TOLERANCE = 0.2
+REPEAT = 3
+
+Auctions = list[list[tuple[Event, EventData]]]
+
+
+def best(repeat: int, run: Callable[[], tuple[int, float]]) -> float:
+    # run returns (operations, seconds), best of repeat is least disturbed by the rest of the machine
+    return max(ops / elapsed for ops, elapsed in (run() for _ in range(repeat)))
+
+
+def fsm_events(auctions: Auctions, compiled: bool) -> tuple[int, float]:
+    fsms = [BazarFSM(compiled=compiled) for _ in auctions]
+    events = 0
+    start = time.perf_counter()
+    for fsm, auction in zip(fsms, auctions):
+        for event, data in auction:
+            fsm.handle_event(event, data)
+        events += len(auction)
+    return events, time.perf_counter() - start
+
+
+def construction(count: int, compiled: bool) -> tuple[int, float]:
+    start = time.perf_counter()
+    for _ in range(count):
+        BazarFSM(compiled=compiled)
+    return count, time.perf_counter() - start
+
+
+def legal_actions(auctions: Auctions) -> tuple[int, float]:
+    # one fresh query per position for every seat, as a view per player asks after every change
+    fsms = [BazarFSM(compiled=True) for _ in auctions]
+    queries = 0
+    elapsed = 0.0
+    for fsm, auction in zip(fsms, auctions):
+        for event, data in auction:
+            fsm.handle_event(event, data)
+            start = time.perf_counter()
+            for player in Player:
+                fsm.legal_actions(player)
+            elapsed += time.perf_counter() - start
+            queries += 4
+    return queries, elapsed
+
+
+def view_update(auctions: Auctions) -> tuple[int, float]:
+    # MultiplayerBazarView.update_state for all four seats after every change; the views have
+    # no lona document, so widget changes are not sent anywhere
+    import main
+
+    registry = TableRegistry(TimerWheel(clock=ManualClock()))
+    updates = 0
+    elapsed = 0.0
+    for i, auction in enumerate(auctions):
+        table_id = f"bench-{i}"
+        table = registry.get(table_id)
+        main.tables = registry
+        views = [
+            main.MultiplayerBazarView(None, None, SimpleNamespace(match_info={"table_id": table_id, "player": p.name}))
+            for p in Player
+        ]
+        for event, data in auction:
+            if event in (Event.BET, Event.CAPO_BET):
+                table.bet(data.player, data.suit, data.amount, event == Event.CAPO_BET)
+            elif event == Event.PASS:
+                table.pass_(data.player)
+            elif event == Event.CONTRA:
+                table.contra(data.player)
+            elif event == Event.RECONTRA:
+                table.recontra(data.player)
+            else:
+                table.timeout()
+            start = time.perf_counter()
+            for view in views:
+                view.update_state()
+            elapsed += time.perf_counter() - start
+            updates += len(views)
+    return updates, elapsed
+
+
+def run_suite(quick: bool) -> dict[str, float]:
+    rng = random.Random(0)
+    auctions = [random_auction(rng) for _ in range(1000 if quick else 5000)]
+    few = auctions[:100 if quick else 300]
+    views = auctions[:30 if quick else 100]  # every auction builds four views, the slow part
+    repeat = 1 if quick else REPEAT
+    count = 1000 if quick else 5000
+    return {
+        "fsm_events": best(repeat, lambda: fsm_events(auctions, compiled=False)),
+        "fsm_events_compiled": best(repeat, lambda: fsm_events(auctions, compiled=True)),
+        "bazar_construction": best(repeat, lambda: construction(count, compiled=False)),
+        "bazar_construction_compiled": best(repeat, lambda: construction(count, compiled=True)),
+        "legal_actions": best(repeat, lambda: legal_actions(few)),
+        "view_update": best(repeat, lambda: view_update(views)),
+    }
+
+
+def compare(results: dict[str, float], baseline: dict[str, float], tolerance: float) -> list[str]:
+    regressions = []
+    for case, value in sorted(results.items()):
+        expected = baseline.get(case)
+        if expected is None:
+            print(f"{case:30s} {value:14,.0f}/s  (no baseline)")
+            continue
+        change = value / expected - 1
+        regressed = change < -tolerance
+        print(f"{case:30s} {value:14,.0f}/s  baseline {expected:14,.0f}/s  {change:+7.1%}"
+              + ("  REGRESSION" if regressed else ""))
+        if regressed:
+            regressions.append(case)
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark suite for fsm, bazar and view updates")
+    parser.add_argument("--quick", action="store_true", help="smaller inputs and no repeats")
+    parser.add_argument("--output", type=Path, help="write results as json")
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    results = run_suite(args.quick)
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "quick": args.quick,
+        "results": results,
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {"quick": args.quick, "results": {}}
+    regressions = compare(results, baseline["results"], args.tolerance)
+    if baseline["quick"] != args.quick:
+        # quick runs are too short and unrepeated to be held to a full baseline or the other way round
+        print("baseline was made with" + ("" if baseline["quick"] else "out") + " --quick, not failing")
+    elif regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
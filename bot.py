@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import copy
+import logging
+import multiprocessing
+import random
+import time
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from threading import Lock
+from typing import Optional
+
+from bazar import BazarFSM, Event, EventData, LegalActions, Memory, Player
+from broadcast import Broadcaster
+from common import Suit
+from hand_strength import MAX_STRENGTH, HandStrengths
+from metrics import BotMetrics
+from play import CARDS, HAND_SIZE, RANKS, SEATS, SEAT_TEAMS, SUIT_MASKS, TrickPlay, cards_of, deal, trump_code
+from scoring import score_deal
+from tables import Table, TableRegistry
+
+logger = logging.getLogger(__name__)
+
+BOT_PROCESSES = 2
+DECISION_TIME = 0.5  # seconds, hard limit from question to answer
+WORK_SHARE = 0.8  # of the decision time spent simulating, the rest is for collecting results
+MAX_ROLLOUTS = 20000  # per process and decision
+MIN_BID_SUIT_CARDS = 2  # without a hand strength table the last bidder is assumed to hold this many of the bid suit
+SAMPLE_ATTEMPTS = 20  # draws before a sample ignores the auction
+BET_SUITS = 2  # strongest suits a bot with a hand strength table bets in
+
+_ACES = sum(1 << (8 * s + RANKS.index("A")) for s in range(len(SUIT_MASKS)))
+
+# the action, None for waiting when it isn't the bot's turn, and the memory if the auction ended with it
+Candidate = tuple[Optional[tuple[Event, EventData]], Memory]  # Optional: evaluated at runtime, python 3.9
+
+
+class _Hypothetical(BazarFSM):
+    # actions the bot only considers aren't traffic, FSM hooks don't see them
+    __slots__ = ()
+    hooks = None
+
+
+def may_act(legal: LegalActions) -> bool:
+    return legal.pass_ or legal.contra or legal.recontra
+
+
+def candidates(fsm: BazarFSM, player: Player, suits: Iterable[Suit] = Suit) -> list[Candidate]:
+    # Pass or wait first, then the lowest legal bet and capo bet per suit, contra and recontra.
+    # The auction is assumed to end after the action, that is the contract it is judged by;
+    # passing before anyone bet ends in a redial.
+    legal = fsm.legal_actions(player)
+    actions: list[tuple[Event, EventData] | None] = [(Event.PASS, EventData(player=player)) if legal.pass_ else None]
+    for suit in suits:
+        if legal.min_bet is not None:
+            actions.append((Event.BET, EventData(player=player, suit=suit, amount=legal.min_bet)))
+        if legal.min_capo_bet is not None:
+            actions.append((Event.CAPO_BET, EventData(player=player, suit=suit, amount=legal.min_capo_bet)))
+    if legal.contra:
+        actions.append((Event.CONTRA, EventData(player=player)))
+    if legal.recontra:
+        actions.append((Event.RECONTRA, EventData(player=player)))
+
+    result = []
+    for action in actions:
+        if action is None or action[0] == Event.PASS:
+            result.append((action, fsm.memory))
+            continue
+        after = _Hypothetical(fsm.current_state, copy.copy(fsm.memory))
+        if after.try_handle_event(*action):
+            result.append((action, after.memory))
+    return result
+
+
+# in pool processes, mapped by _init_worker
+_strengths: HandStrengths | None = None
+
+
+def sample_hands(rng: random.Random,
+                 seat: int,
+                 hand: int,
+                 bidder: int | None,
+                 bid_suit: Suit | None,
+                 strengths: HandStrengths = None) -> list[int]:
+    # The other three hands from the unseen cards, preferring deals that fit the last bid. With
+    # a hand strength table a deal is kept with probability proportional to the bidder's strength
+    # in the bid suit, otherwise the bidder has to hold the bid suit (aces for Suit.NONE).
+    unseen = [c for c in range(CARDS) if not hand >> c & 1]
+    wanted = 0
+    if bidder is not None and bidder != seat:
+        wanted = _ACES if bid_suit == Suit.NONE else SUIT_MASKS[trump_code(bid_suit)]
+    for _ in range(SAMPLE_ATTEMPTS):
+        rng.shuffle(unseen)
+        hands = []
+        others = iter(range(3))
+        for s in range(len(SEATS)):
+            if s == seat:
+                hands.append(hand)
+            else:
+                i = next(others) * HAND_SIZE
+                hands.append(sum(1 << c for c in unseen[i:i + HAND_SIZE]))
+        if not wanted:
+            return hands
+        if strengths is not None:
+            if rng.random() * MAX_STRENGTH < strengths.of(hands[bidder], bid_suit):
+                return hands
+        elif bin(hands[bidder] & wanted).count("1") >= MIN_BID_SUIT_CARDS:
+            return hands
+    return hands
+
+
+def _playout(rng: random.Random, hands: list[int], trump: int) -> TrickPlay:
+    play = TrickPlay(hands, trump)
+    while not play.is_over:
+        play.play(rng.choice(cards_of(play.legal_cards())))
+    return play
+
+
+def _simulate(seat: int,
+              hand: int,
+              memories: list[Memory],
+              deadline: float,
+              seed: int,
+              max_rollouts: int = MAX_ROLLOUTS) -> tuple[list[int], int]:
+    # Runs in a pool process until the deadline: every rollout samples the hidden hands once, plays
+    # them out once per trump and scores every candidate contract on it. Returns the summed score
+    # difference for the bot's team per candidate and the number of rollouts.
+    rng = random.Random(seed)
+    team = SEAT_TEAMS[seat]
+    memory = memories[0]  # pass or wait, the auction as it is
+    bidder = None if memory.last_bet_player is None else SEATS.index(memory.last_bet_player)
+    sums = [0] * len(memories)
+    rollouts = 0
+    if all(m.last_bet_amount is None for m in memories):
+        return sums, rollouts
+    while rollouts < max_rollouts and time.monotonic() < deadline:
+        hands = sample_hands(rng, seat, hand, bidder, memory.last_bet_suit, _strengths)
+        plays: dict[int, TrickPlay] = {}
+        for i, m in enumerate(memories):
+            if m.last_bet_amount is None:
+                continue  # redial scores nothing
+            trump = trump_code(m.last_bet_suit)
+            play = plays.get(trump)
+            if play is None:
+                play = plays[trump] = _playout(rng, hands, trump)
+            scores = score_deal(m, play.team_points, play.team_tricks).scores
+            sums[i] += scores[team] - scores[1 - team]
+        rollouts += 1
+    return sums, rollouts
+
+
+def _init_worker(strengths_path: str | None) -> None:
+    # every process maps the same file, the pages are shared through the page cache
+    global _strengths
+    _strengths = None if strengths_path is None else HandStrengths.load(strengths_path)
+
+
+def _ready() -> None:
+    pass
+
+
+class BiddingBot:
+    # Monte-Carlo bidder shared by every bot seat. Each decision runs one simulation per pool
+    # process with its own seed; whatever came back when the decision time is up is used,
+    # and if nothing did the bot waits or passes. With a hand strength table only bets in the
+    # BET_SUITS strongest suits of the hand are simulated, and pool processes weight the deals
+    # they sample by the last bidder's strength.
+    def __init__(self,
+                 processes: int = BOT_PROCESSES,
+                 decision_time: float = DECISION_TIME,
+                 metrics: BotMetrics = None,
+                 strengths: HandStrengths = None) -> None:
+        self.processes = processes
+        self.decision_time = decision_time
+        self.metrics = metrics
+        self.strengths = strengths
+        self._pool = ProcessPoolExecutor(
+            processes,
+            mp_context=multiprocessing.get_context("fork"),
+            initializer=_init_worker,
+            initargs=(None if strengths is None else str(strengths.path),),
+        )
+        # start every process now, not within the first decision's time limit
+        wait([self._pool.submit(_ready) for _ in range(processes)])
+        self._seeds = random.Random()
+
+    def decide(self, fsm: BazarFSM, player: Player, hand: int) -> tuple[Event, EventData] | None:
+        start = time.monotonic()
+        suits: Iterable[Suit] = Suit
+        if self.strengths is not None:
+            suits = sorted(Suit, key=lambda suit: self.strengths.of(hand, suit), reverse=True)[:BET_SUITS]
+        options = candidates(fsm, player, suits)
+        memories = [memory for _, memory in options]
+        deadline = start + self.decision_time * WORK_SHARE
+        futures = [] if len(options) == 1 else [
+            self._pool.submit(_simulate, SEATS.index(player), hand, memories, deadline, self._seeds.getrandbits(32))
+            for _ in range(self.processes)
+        ]
+        done, not_done = wait(futures, timeout=max(0.0, start + self.decision_time - time.monotonic()))
+        for future in not_done:
+            future.cancel()
+
+        sums = [0] * len(options)
+        rollouts = 0
+        for future in done:
+            try:
+                partial, n = future.result()
+            except Exception:
+                logger.exception("Exception raised while simulating for %s", player)
+                continue
+            sums = [a + b for a, b in zip(sums, partial)]
+            rollouts += n
+        if rollouts:
+            action = options[max(range(len(options)), key=sums.__getitem__)][0]
+        else:
+            action = options[0][0]  # pass or wait
+        if self.metrics is not None:
+            self.metrics.decided(action and action[0], time.monotonic() - start, rollouts)
+        return action
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+class BotSeat:
+    # A virtual player at a table: watches it like a view and answers through the same table
+    # methods. Decisions run on the seat's own thread, never on the broadcaster's, and changes
+    # arriving meanwhile are coalesced into one more decision.
+    def __init__(self,
+                 bot: BiddingBot,
+                 tables: TableRegistry,
+                 broadcaster: Broadcaster,
+                 table_id: str,
+                 player: Player,
+                 hand: int = None) -> None:
+        self.bot = bot
+        self.tables = tables
+        self.broadcaster = broadcaster
+        self.player = player
+        # tables don't deal cards yet, so the bot draws its own hand
+        self.hand = deal(random.Random())[SEATS.index(player)] if hand is None else hand
+        self.table: Table = tables.join(table_id)
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix=f"bot-{player.name}")
+        self._lock = Lock()
+        self._queued = False
+        self._closed = False
+        broadcaster.subscribe(self.table.id, self._changed)
+        self._changed(self.table.version)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+        self.broadcaster.unsubscribe(self.table.id, self._changed)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self.tables.leave(self.table)
+
+    def _changed(self, version: int) -> None:
+        with self._lock:
+            if self._closed or self._queued:
+                return
+            self._queued = True
+        self._executor.submit(self._act)
+
+    def _act(self) -> None:
+        with self._lock:
+            self._queued = False
+        try:
+            with self.table.lock:
+                version = self.table.version
+                fsm = BazarFSM(self.table.fsm.current_state, copy.copy(self.table.fsm.memory))
+            if fsm.is_terminal or not may_act(fsm.legal_actions(self.player)):
+                return
+            action = self.bot.decide(fsm, self.player, self.hand)
+            if action is None or self.table.version != version:
+                return  # waiting, or the table moved on and the next decision is queued
+            self._apply(*action)
+        except Exception:
+            logger.exception("Exception raised while %s was deciding at table %r", self.player, self.table.id)
+
+    def _apply(self, event: Event, data: EventData) -> None:
+        if event == Event.PASS:
+            self.table.pass_(self.player)
+        elif event in (Event.BET, Event.CAPO_BET):
+            self.table.bet(self.player, data.suit, data.amount, event == Event.CAPO_BET)
+        elif event == Event.CONTRA:
+            self.table.contra(self.player)
+        elif event == Event.RECONTRA:
+            self.table.recontra(self.player)
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import logging
+from threading import Lock
+from typing import Callable
+
+from tables import Table
+from timers import TimerWheel, Timeout
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_WINDOW = 0.05  # seconds
+
+Subscriber = Callable[[int], None]
+
+
+class Broadcaster:
+    # Changes of a table within one window are coalesced: subscribers get one call
+    # with the latest table version per window, however many actions happened.
+    def __init__(self, timers: TimerWheel, window: float = BROADCAST_WINDOW) -> None:
+        self.timers = timers
+        self.window = window
+        self.published = 0
+        self.delivered = 0
+        self._subscribers: dict[str, dict[Subscriber, None]] = {}
+        self._dirty: dict[str, Table] = {}
+        self._flush: Timeout | None = None
+        self._lock = Lock()
+
+    def subscribe(self, table_id: str, subscriber: Subscriber) -> None:
+        with self._lock:
+            self._subscribers.setdefault(table_id, {})[subscriber] = None
+
+    def unsubscribe(self, table_id: str, subscriber: Subscriber) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(table_id)
+            if subscribers is None:
+                return
+            subscribers.pop(subscriber, None)
+            if not subscribers:
+                del self._subscribers[table_id]
+
+    def publish(self, table: Table) -> None:
+        with self._lock:
+            self.published += 1
+            self._dirty[table.id] = table
+            if self._flush is None:
+                self._flush = self.timers.schedule(self.window, self.flush)
+
+    def flush(self) -> None:
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            self._flush = None
+            updates = [
+                (table.version, list(self._subscribers.get(table_id, ())))
+                for table_id, table in dirty.items()
+            ]
+        for version, subscribers in updates:
+            for subscriber in subscribers:
+                self.delivered += 1
+                try:
+                    subscriber(version)
+                except Exception:
+                    logger.exception("Exception raised while delivering table update to %s", subscriber)
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+from bazar import BazarFSM, Event, EventData, Memory, Player, State
+from common import Suit
+
+# Bit layout of a packed position, from the least significant bit:
+#   state            3 bits
+#   current_player   2 bits
+#   pass_count       3 bits
+#   last_bet_player  3 bits (0 is None)
+#   last_bet_suit    3 bits (0 is None)
+#   last_bet_amount 10 bits (0 is None, otherwise amount + 1)
+#   capo, contra, recontra 1 bit each
+PACKED_BITS = 27
+PACKED_SIZE = 4  # bytes
+MAX_AMOUNT = (1 << 10) - 2
+MAX_PASS_COUNT = (1 << 3) - 1
+
+_STATE_SHIFT = 0
+_CURRENT_PLAYER_SHIFT = 3
+_PASS_COUNT_SHIFT = 5
+_LAST_BET_PLAYER_SHIFT = 8
+_LAST_BET_SUIT_SHIFT = 11
+_LAST_BET_AMOUNT_SHIFT = 14
+_CAPO_SHIFT = 24
+_CONTRA_SHIFT = 25
+_RECONTRA_SHIFT = 26
+
+_STATES: tuple[State, ...] = tuple(State)
+_PLAYERS: tuple[Player, ...] = tuple(Player)
+_SUITS: tuple[Suit, ...] = tuple(Suit)
+_STATE_CODES = {s: i for i, s in enumerate(_STATES)}
+_PLAYER_CODES = {p: i for i, p in enumerate(_PLAYERS)}
+# None is encoded as 0 for optional fields
+_OPTIONAL_PLAYER_CODES = {None: 0, **{p: i + 1 for i, p in enumerate(_PLAYERS)}}
+_OPTIONAL_SUIT_CODES = {None: 0, **{s: i + 1 for i, s in enumerate(_SUITS)}}
+_OPTIONAL_PLAYERS = (None, *_PLAYERS)
+_OPTIONAL_SUITS = (None, *_SUITS)
+
+
+def pack(state: State, memory: Memory) -> int:
+    if not 0 <= memory.pass_count <= MAX_PASS_COUNT:
+        raise ValueError(f"pass count out of range: {memory.pass_count}")
+    amount = memory.last_bet_amount
+    if amount is None:
+        amount_code = 0
+    elif 0 <= amount <= MAX_AMOUNT:
+        amount_code = amount + 1
+    else:
+        raise ValueError(f"bet amount out of range: {amount}")
+    return (
+        _STATE_CODES[state] << _STATE_SHIFT
+        | _PLAYER_CODES[memory.current_player] << _CURRENT_PLAYER_SHIFT
+        | memory.pass_count << _PASS_COUNT_SHIFT
+        | _OPTIONAL_PLAYER_CODES[memory.last_bet_player] << _LAST_BET_PLAYER_SHIFT
+        | _OPTIONAL_SUIT_CODES[memory.last_bet_suit] << _LAST_BET_SUIT_SHIFT
+        | amount_code << _LAST_BET_AMOUNT_SHIFT
+        | memory.capo << _CAPO_SHIFT
+        | memory.contra << _CONTRA_SHIFT
+        | memory.recontra << _RECONTRA_SHIFT
+    )
+
+
+def _decode(values: tuple, code: int, field: str):
+    # field codes of corrupt data can point past the known values
+    if code >= len(values):
+        raise ValueError(f"unknown {field} code: {code}")
+    return values[code]
+
+
+def unpack_into(code: int, memory: Memory) -> State:
+    # overwrites every field of existing memory, useful to avoid allocations in hot loops;
+    # every field is decoded before the first one is written, invalid codes leave memory as it was
+    if not 0 <= code < 1 << PACKED_BITS:
+        raise ValueError(f"packed position out of range: {code}")
+    state = _decode(_STATES, code >> _STATE_SHIFT & 0b111, "state")
+    last_bet_player = _decode(_OPTIONAL_PLAYERS, code >> _LAST_BET_PLAYER_SHIFT & 0b111, "player")
+    last_bet_suit = _decode(_OPTIONAL_SUITS, code >> _LAST_BET_SUIT_SHIFT & 0b111, "suit")
+    memory.current_player = _PLAYERS[code >> _CURRENT_PLAYER_SHIFT & 0b11]
+    memory.pass_count = code >> _PASS_COUNT_SHIFT & 0b111
+    memory.last_bet_player = last_bet_player
+    memory.last_bet_suit = last_bet_suit
+    amount_code = code >> _LAST_BET_AMOUNT_SHIFT & 0b11_1111_1111
+    memory.last_bet_amount = None if amount_code == 0 else amount_code - 1
+    memory.capo = bool(code >> _CAPO_SHIFT & 1)
+    memory.contra = bool(code >> _CONTRA_SHIFT & 1)
+    memory.recontra = bool(code >> _RECONTRA_SHIFT & 1)
+    return state
+
+
+def unpack(code: int) -> tuple[State, Memory]:
+    memory = Memory(current_player=Player.A)
+    state = unpack_into(code, memory)
+    return state, memory
+
+
+def pack_fsm(fsm: BazarFSM) -> int:
+    return pack(fsm.current_state, fsm.memory)
+
+
+def unpack_fsm(code: int, compiled: bool = False) -> BazarFSM:
+    state, memory = unpack(code)
+    return BazarFSM(state, memory, compiled)
+
+
+def to_bytes(code: int) -> bytes:
+    return code.to_bytes(PACKED_SIZE, "little")
+
+
+def from_bytes(data: bytes) -> int:
+    if len(data) != PACKED_SIZE:
+        raise ValueError(f"packed position must be {PACKED_SIZE} bytes, got {len(data)}")
+    return int.from_bytes(data, "little")
+
+
+# Events are packed the same way, from the least significant bit:
+#   event   3 bits
+#   player  3 bits (0 is None)
+#   suit    3 bits (0 is None)
+#   amount 10 bits (0 is None, otherwise amount + 1)
+PACKED_EVENT_BITS = 19
+_EVENT_SHIFT = 0
+_EVENT_PLAYER_SHIFT = 3
+_EVENT_SUIT_SHIFT = 6
+_EVENT_AMOUNT_SHIFT = 9
+
+_EVENTS: tuple[Event, ...] = tuple(Event)
+_EVENT_CODES = {e: i for i, e in enumerate(_EVENTS)}
+
+
+def pack_event(event: Event, data: EventData) -> int:
+    amount = data.amount
+    if amount is None:
+        amount_code = 0
+    elif 0 <= amount <= MAX_AMOUNT:
+        amount_code = amount + 1
+    else:
+        raise ValueError(f"bet amount out of range: {amount}")
+    return (
+        _EVENT_CODES[event] << _EVENT_SHIFT
+        | _OPTIONAL_PLAYER_CODES[data.player] << _EVENT_PLAYER_SHIFT
+        | _OPTIONAL_SUIT_CODES[data.suit] << _EVENT_SUIT_SHIFT
+        | amount_code << _EVENT_AMOUNT_SHIFT
+    )
+
+
+def unpack_event(code: int) -> tuple[Event, EventData]:
+    if not 0 <= code < 1 << PACKED_EVENT_BITS:
+        raise ValueError(f"packed event out of range: {code}")
+    amount_code = code >> _EVENT_AMOUNT_SHIFT & 0b11_1111_1111
+    return _decode(_EVENTS, code >> _EVENT_SHIFT & 0b111, "event"), EventData(
+        player=_decode(_OPTIONAL_PLAYERS, code >> _EVENT_PLAYER_SHIFT & 0b111, "player"),
+        suit=_decode(_OPTIONAL_SUITS, code >> _EVENT_SUIT_SHIFT & 0b111, "suit"),
+        amount=None if amount_code == 0 else amount_code - 1,
+    )
@@ -1,4 +1,8 @@
+from __future__ import annotations
+
+import sys
 from enum import Enum, auto
+from types import BuiltinFunctionType, FunctionType, MethodType, ModuleType
 
 
 class AutoName(Enum):
@@ -22,3 +26,27 @@ class Location(AutoName):
     BOTTOM = auto()
     LEFT = auto()
     RIGHT = auto()
+
+
+def deep_sizeof(obj, seen: set[int] = None) -> int:
+    # Approximate memory held by obj: follows containers and instance attributes,
+    # but not classes, functions, modules and enum members which are shared by everyone.
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or isinstance(obj, (type, Enum, ModuleType, FunctionType, MethodType, BuiltinFunctionType)):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(i, seen) for i in obj)
+    if hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    for cls in type(obj).__mro__:
+        # every class declares only its own slots
+        slots = cls.__dict__.get("__slots__", ())
+        for slot in (slots,) if isinstance(slots, str) else slots:
+            if hasattr(obj, slot):
+                size += deep_sizeof(getattr(obj, slot), seen)
+    return size
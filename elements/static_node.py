@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from lona.html import Node
+from lona.html.abstract_node import AbstractNode
+
+
+class Template:
+    # Static subtree, built and serialized once at import and shared by every view.
+    # Nothing in it may change or handle events: patches and input events need per view nodes.
+    def __init__(self, node: Node) -> None:
+        self.serialized = node._serialize()
+        self.html_head, self.html_tail = str(node).split(f'data-lona-node-id="{node.id}"', 1)
+        self.text = node.get_text()
+
+    def __call__(self) -> StaticNode:
+        return StaticNode(self)
+
+
+class StaticNode(AbstractNode):
+    # what a view keeps of a template: the template, its own node id and parent
+    def __init__(self, template: Template) -> None:
+        self._template = template
+
+    def _serialize(self) -> list:
+        serialized = list(self._template.serialized)
+        serialized[1] = self.id
+        return serialized
+
+    def __str__(self) -> str:
+        return f'{self._template.html_head}data-lona-node-id="{self.id}"{self._template.html_tail}'
+
+    def get_text(self) -> str:
+        return self._template.text
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
-from collections import defaultdict, Callable
-from typing import TypeVar, Generic
+import time
+from enum import Enum
+from typing import Callable, Literal, TypeVar, Generic
 
 State = TypeVar("State")
 Event = TypeVar("Event")
@@ -40,6 +41,13 @@ class Transition(Generic[State, Memory, Event, EventData]):
         else:
             return self.condition(state, memory, event, data)
 
+    # first condition that doesn't hold, None if all do; state is expected to be from_
+    def failed_condition(self, state: State, memory: Memory, event: Event, data: EventData) -> Condition | None:
+        for c in _as_tuple(self.condition):
+            if not c(state, memory, event, data):
+                return c
+        return None
+
     def apply(self, state: State, memory: Memory, event: Event, data: EventData) -> State:
         if isinstance(self.callback, list):
             for c in self.callback:
@@ -50,19 +58,175 @@ class Transition(Generic[State, Memory, Event, EventData]):
         return self.to
 
 
+# (conditions, callbacks, to, to_id)
+Dispatch = tuple[tuple[Condition, ...], tuple[Callback, ...], State, int]
+
+
+def _as_tuple(value: Callable | list[Callable] | None) -> tuple[Callable, ...]:
+    if value is None:
+        return ()
+    if isinstance(value, list):
+        return tuple(value)
+    return (value,)
+
+
+class RejectReason(Enum):
+    # values are the messages handle_event raises with
+    TERMINAL = "terminal"
+    NOT_POSSIBLE = "event is not possible from current state"
+    CONDITION = "applicable transition not found"
+
+
+class Rejection(Generic[State, Event]):
+    # Why try_handle_event didn't apply an event, found in the same pass that rejected it.
+    # Falsy, so callers only interested in whether the event was applied can keep testing the result.
+    # Slots and names resolved on demand: with many players acting out of turn rejections are common.
+    __slots__ = ("state", "event", "reason", "failed")
+
+    def __init__(self, state: State, event: Event, reason: RejectReason, failed: tuple[Condition, ...] = ()) -> None:
+        self.state = state
+        self.event = event
+        self.reason = reason
+        self.failed = failed  # with CONDITION, first failed condition of every candidate transition
+
+    @property
+    def conditions(self) -> tuple[str, ...]:
+        # names in order, without repeats: a condition shared by several candidates is reported once
+        return tuple(dict.fromkeys(getattr(c, "__name__", repr(c)) for c in self.failed))
+
+    def __bool__(self) -> bool:
+        return False
+
+    def __eq__(self, other: object) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._astuple() == other._astuple()
+
+    def __hash__(self) -> int:
+        return hash(self._astuple())
+
+    def _astuple(self) -> tuple:
+        return self.state, self.event, self.reason, self.failed
+
+    def __repr__(self) -> str:
+        return f"Rejection({self.state!r}, {self.event!r}, {self.reason.name}, {self.conditions!r})"
+
+    def error(self) -> Exception:
+        if self.reason == RejectReason.TERMINAL:
+            return RuntimeError(self.reason.value)
+        return ValueError(self.reason.value)
+
+
+# Transitions compiled into flat rows indexed by interned state/event ids.
+# Row of a terminal state is None, cell of an impossible event is None,
+# otherwise cell holds candidates in the same order as in the transitions list.
+class DispatchTable(Generic[State, Memory, Event, EventData]):
+    def __init__(self, transitions: list[Transition[State, Memory, Event, EventData]]):
+        self.state_ids: dict[State, int] = {}
+        self.event_ids: dict[Event, int] = {}
+        for t in transitions:
+            self.state_ids.setdefault(t.from_, len(self.state_ids))
+            self.state_ids.setdefault(t.to, len(self.state_ids))
+            self.event_ids.setdefault(t.event, len(self.event_ids))
+
+        cells: list[list[list[Dispatch] | None] | None] = [None] * len(self.state_ids)
+        for t in transitions:
+            row = cells[self.state_ids[t.from_]]
+            if row is None:
+                row = cells[self.state_ids[t.from_]] = [None] * len(self.event_ids)
+            event_id = self.event_ids[t.event]
+            if row[event_id] is None:
+                row[event_id] = []
+            row[event_id].append((_as_tuple(t.condition), _as_tuple(t.callback), t.to, self.state_ids[t.to]))
+
+        self.rows: tuple[tuple[tuple[Dispatch, ...] | None, ...] | None, ...] = tuple(
+            None if row is None else tuple(None if cell is None else tuple(cell) for cell in row)
+            for row in cells
+        )
+
+    def row(self, state: State) -> tuple[tuple[Dispatch, ...] | None, ...] | None:
+        state_id = self.state_ids.get(state)
+        if state_id is None:
+            return None
+        return self.rows[state_id]
+
+
+# Transitions indexed by state and event. Immutable once built, so one instance
+# can be shared by every FSM with the same rules.
+class Rules(Generic[State, Memory, Event, EventData]):
+    def __init__(self, transitions: list[Transition[State, Memory, Event, EventData]]):
+        self.transitions = tuple(transitions)
+        index: dict[State, dict[Event, list[Transition[State, Memory, Event, EventData]]]] = {}
+        for t in transitions:
+            index.setdefault(t.from_, {}).setdefault(t.event, []).append(t)
+        self.index: dict[State, dict[Event, tuple[Transition[State, Memory, Event, EventData], ...]]] = {
+            state: {event: tuple(ts) for event, ts in events.items()} for state, events in index.items()
+        }
+        self._dispatch_table: DispatchTable[State, Memory, Event, EventData] | None = None
+
+    @property
+    def dispatch_table(self) -> DispatchTable[State, Memory, Event, EventData]:
+        # compiled on first use
+        if self._dispatch_table is None:
+            self._dispatch_table = DispatchTable(list(self.transitions))
+        return self._dispatch_table
+
+
+class FSMHooks:
+    # Observer of handle_event and try_handle_event, probes with can_handle_event aren't reported.
+    # Called on the thread handling the event, so implementations must be thread safe.
+    def pre_transition(self, fsm: FSM, state: State, event: Event, data: EventData) -> None:
+        pass
+
+    def post_transition(self, fsm: FSM, from_: State, to: State, event: Event, data: EventData,
+                        seconds: float) -> None:
+        pass
+
+    def rejected(self, fsm: FSM, event: Event, data: EventData, rejection: Rejection) -> None:
+        pass
+
+
 class FSM(Generic[State, Memory, Event, EventData]):
+    # per instance only the position and references to shared rules
+    __slots__ = ("memory", "transitions", "dispatch_table", "revision", "_current_state", "_row")
+
+    # class wide, e.g. BazarFSM.hooks = collector; None costs one attribute check per event
+    hooks: FSMHooks | None = None
+
     def __init__(self,
                  initial_state: State,
                  initial_memory: Memory,
-                 transitions: list[Transition[State, Memory, Event, EventData]]):
-        self.current_state = initial_state
+                 transitions: (list[Transition[State, Memory, Event, EventData]]
+                               | Rules[State, Memory, Event, EventData]),
+                 compiled: bool = False):
+        rules = transitions if isinstance(transitions, Rules) else Rules(transitions)
         self.memory = initial_memory
-        self.transitions: dict[State, dict[Event, list[Transition[State, Memory, Event, EventData]]]] = \
-            defaultdict(lambda: defaultdict(list))
-        for t in transitions:
-            self.transitions[t.from_][t.event].append(t)
+        self.transitions = rules.index
+        self.dispatch_table: DispatchTable[State, Memory, Event, EventData] | None = \
+            rules.dispatch_table if compiled else None
+        self.revision = 0  # incremented on every state change, lets subclasses cache derived data
+        self.current_state = initial_state
+
+    @property
+    def current_state(self) -> State:
+        return self._current_state
+
+    @current_state.setter
+    def current_state(self, state: State) -> None:
+        self._current_state = state
+        self.revision += 1
+        if self.dispatch_table is not None:
+            self._row = self.dispatch_table.row(state)
+
+    @property
+    def is_terminal(self) -> bool:
+        if self.dispatch_table is not None:
+            return self._row is None
+        return self.current_state not in self.transitions
 
     def can_handle_event(self, event: Event, data: EventData) -> bool:
+        if self.dispatch_table is not None:
+            return self._can_handle_event_compiled(event, data)
         if self.current_state not in self.transitions:
             return False
         if event not in self.transitions[self.current_state]:
@@ -70,8 +234,44 @@ class FSM(Generic[State, Memory, Event, EventData]):
         for t in self.transitions[self.current_state][event]:
             if t.applicable(self.current_state, self.memory, event, data):
                 return True
+        return False
 
     def handle_event(self, event: Event, data: EventData) -> bool:
+        if self.hooks is not None:
+            result = self._observe(event, data)
+            if not result:
+                raise result.error()
+            return not self.is_terminal
+        if self.dispatch_table is not None:
+            return self._handle_event_compiled(event, data)
+        return self._handle_event_plain(event, data)
+
+    # check and apply in one pass, returns True if event was applied, otherwise why not
+    def try_handle_event(self, event: Event, data: EventData) -> Literal[True] | Rejection[State, Event]:
+        if self.hooks is not None:
+            return self._observe(event, data)
+        if self.dispatch_table is not None:
+            return self._try_handle_event_compiled(event, data)
+        return self._try_handle_event_plain(event, data)
+
+    def _observe(self, event: Event, data: EventData) -> Literal[True] | Rejection[State, Event]:
+        hooks = self.hooks
+        state = self._current_state
+        hooks.pre_transition(self, state, event, data)
+        start = time.perf_counter()
+        result = self._try_handle_event_unobserved(event, data)
+        if result:
+            hooks.post_transition(self, state, self._current_state, event, data, time.perf_counter() - start)
+        else:
+            hooks.rejected(self, event, data, result)
+        return result
+
+    def _try_handle_event_unobserved(self, event: Event, data: EventData) -> Literal[True] | Rejection[State, Event]:
+        if self.dispatch_table is not None:
+            return self._try_handle_event_compiled(event, data)
+        return self._try_handle_event_plain(event, data)
+
+    def _handle_event_plain(self, event: Event, data: EventData) -> bool:
         if self.current_state not in self.transitions:
             raise RuntimeError("terminal")
         if event not in self.transitions[self.current_state]:
@@ -81,3 +281,80 @@ class FSM(Generic[State, Memory, Event, EventData]):
                 self.current_state = t.apply(self.current_state, self.memory, event, data)
                 return self.current_state in self.transitions
         raise ValueError("applicable transition not found")
+
+    def _try_handle_event_plain(self, event: Event, data: EventData) -> Literal[True] | Rejection[State, Event]:
+        if self.current_state not in self.transitions:
+            return Rejection(self.current_state, event, RejectReason.TERMINAL)
+        if event not in self.transitions[self.current_state]:
+            return Rejection(self.current_state, event, RejectReason.NOT_POSSIBLE)
+        failed = []
+        for t in self.transitions[self.current_state][event]:
+            condition = t.failed_condition(self.current_state, self.memory, event, data)
+            if condition is None:
+                self.current_state = t.apply(self.current_state, self.memory, event, data)
+                return True
+            failed.append(condition)
+        return Rejection(self.current_state, event, RejectReason.CONDITION, tuple(failed))
+
+    def _can_handle_event_compiled(self, event: Event, data: EventData) -> bool:
+        row = self._row
+        if row is None:
+            return False
+        event_id = self.dispatch_table.event_ids.get(event)
+        if event_id is None or row[event_id] is None:
+            return False
+        state = self._current_state
+        memory = self.memory
+        for conditions, _, _, _ in row[event_id]:
+            for c in conditions:
+                if not c(state, memory, event, data):
+                    break
+            else:
+                return True
+        return False
+
+    def _handle_event_compiled(self, event: Event, data: EventData) -> bool:
+        row = self._row
+        if row is None:
+            raise RuntimeError("terminal")
+        event_id = self.dispatch_table.event_ids.get(event)
+        if event_id is None or row[event_id] is None:
+            raise ValueError("event is not possible from current state")
+        state = self._current_state
+        memory = self.memory
+        for conditions, callbacks, to, to_id in row[event_id]:
+            for c in conditions:
+                if not c(state, memory, event, data):
+                    break
+            else:
+                for c in callbacks:
+                    c(state, to, memory, event, data)
+                self._current_state = to
+                self.revision += 1
+                self._row = self.dispatch_table.rows[to_id]
+                return self._row is not None
+        raise ValueError("applicable transition not found")
+
+    def _try_handle_event_compiled(self, event: Event, data: EventData) -> Literal[True] | Rejection[State, Event]:
+        row = self._row
+        if row is None:
+            return Rejection(self._current_state, event, RejectReason.TERMINAL)
+        event_id = self.dispatch_table.event_ids.get(event)
+        if event_id is None or row[event_id] is None:
+            return Rejection(self._current_state, event, RejectReason.NOT_POSSIBLE)
+        state = self._current_state
+        memory = self.memory
+        failed = []
+        for conditions, callbacks, to, to_id in row[event_id]:
+            for c in conditions:
+                if not c(state, memory, event, data):
+                    failed.append(c)
+                    break
+            else:
+                for c in callbacks:
+                    c(state, to, memory, event, data)
+                self._current_state = to
+                self.revision += 1
+                self._row = self.dispatch_table.rows[to_id]
+                return True
+        return Rejection(state, event, RejectReason.CONDITION, tuple(failed))
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+import argparse
+import mmap
+import struct
+import time
+from math import comb
+from pathlib import Path
+
+import numpy as np
+
+from common import Suit
+from play import BYTE_POINTS, CARDS, HAND_SIZE, RANKS, SUITS, trump_code
+
+# Strength of every possible 8-card hand per trump, precomputed into a file that is memory-mapped
+# at runtime. A hand's row is its combinadic rank: with cards c0 < c1 < ... < c7 it is
+# C(c0, 1) + C(c1, 2) + ... + C(c7, 8), which numbers the C(32, 8) hands 0..HANDS-1 without gaps.
+# The terms of one suit depend only on its byte and the number of cards in lower suits, so the
+# rank is summed from four table lookups.
+# A row holds one byte per trump, SUITS order and then no trumps, so trump_code(suit) indexes it.
+#
+# Strength estimates the card points a hand is good for as the trump's bidder: its own card
+# points, WINNER_POINTS for each top card of a suit (A, 10, K... plain, J, 9, A... in trumps)
+# held in an unbroken run from the top, TRUMP_LENGTH_POINTS per trump and RUFF_POINTS per
+# trump that can ruff a short side suit.
+
+HANDS = comb(CARDS, HAND_SIZE)
+COLUMNS = len(SUITS) + 1
+WINNER_POINTS = 10
+TRUMP_LENGTH_POINTS = 5
+RUFF_POINTS = 10
+RUFF_LENGTH = 2  # side suits shorter than this can be ruffed, once per missing card
+MAX_STRENGTH = 255
+
+HEADER = struct.Struct("<4sHHI")  # magic, version, columns, hands
+MAGIC = b"BZHS"
+VERSION = 1
+HAND_STRENGTH_FILE = "hand_strength.bin"  # main.py loads it from DATA_DIR
+
+
+def _rank_parts(suit: int, below: int) -> tuple[int, ...]:
+    # per byte of the suit, its cards' share of the rank with `below` cards in lower suits
+    parts = []
+    for byte in range(256):
+        cards = [8 * suit + rank for rank in range(8) if byte >> rank & 1]
+        parts.append(sum(comb(c, below + i + 1) for i, c in enumerate(cards)))
+    return tuple(parts)
+
+
+# RANK_PARTS[suit][below][byte], the rank is one lookup per suit
+RANK_PARTS = tuple(tuple(_rank_parts(s, below) for below in range(HAND_SIZE + 1)) for s in range(len(SUITS)))
+
+_PLAIN_ORDER = tuple(RANKS.index(r) for r in ("A", "10", "K", "Q", "J", "9", "8", "7"))
+_TRUMP_ORDER = tuple(RANKS.index(r) for r in ("J", "9", "A", "10", "K", "Q", "8", "7"))
+_LENGTH = tuple(bin(byte).count("1") for byte in range(256))
+
+
+def _winners(byte: int, order: tuple[int, ...]) -> int:
+    count = 0
+    for rank in order:
+        if not byte >> rank & 1:
+            break
+        count += 1
+    return count
+
+
+# value of one suit of a hand given as its byte, in plain suits and as trumps
+_PLAIN_VALUE = tuple(BYTE_POINTS[0][0][b] + WINNER_POINTS * _winners(b, _PLAIN_ORDER) for b in range(256))
+_TRUMP_VALUE = tuple(
+    BYTE_POINTS[1][0][b] + WINNER_POINTS * _winners(b, _TRUMP_ORDER) + TRUMP_LENGTH_POINTS * _LENGTH[b]
+    for b in range(256)
+)
+
+
+def column(suit: Suit | None) -> int:
+    return trump_code(suit) % COLUMNS
+
+
+def hand_index(hand: int) -> int:
+    if hand >> CARDS or bin(hand).count("1") != HAND_SIZE:
+        raise ValueError(f"a hand has {HAND_SIZE} of {CARDS} cards, got {hand:#x}")
+    index = below = 0
+    for suit in range(len(SUITS)):
+        byte = hand >> (8 * suit) & 0xFF
+        index += RANK_PARTS[suit][below][byte]
+        below += _LENGTH[byte]
+    return index
+
+
+def strength(hand: int, trump: int) -> int:
+    # one hand computed on the spot, what the table holds precomputed
+    total = trumps = short = 0
+    for suit in range(len(SUITS)):
+        byte = hand >> (8 * suit) & 0xFF
+        if suit == trump:
+            total += _TRUMP_VALUE[byte]
+            trumps = _LENGTH[byte]
+        else:
+            total += _PLAIN_VALUE[byte]
+            short += max(0, RUFF_LENGTH - _LENGTH[byte])
+    return min(total + RUFF_POINTS * min(trumps, short), MAX_STRENGTH)
+
+
+def hands_in_order() -> np.ndarray:
+    # every hand as a card mask, in combinadic rank order. The hands of k cards below card t are
+    # a prefix of the hands of k cards, so each size is the previous one extended by every top card.
+    hands = np.zeros(1, dtype=np.uint32)
+    for k in range(1, HAND_SIZE + 1):
+        hands = np.concatenate([
+            hands[:comb(top, k - 1)] | np.uint32(1 << top) for top in range(k - 1, CARDS)
+        ])
+    return hands
+
+
+def build_table(hands: np.ndarray) -> np.ndarray:
+    # strength of many hands at once, (N, COLUMNS) bytes, the same numbers as strength
+    plain_value = np.array(_PLAIN_VALUE, dtype=np.int16)
+    trump_value = np.array(_TRUMP_VALUE, dtype=np.int16)
+    length = np.array(_LENGTH, dtype=np.int16)
+    suits = [(hands >> np.uint32(8 * s) & np.uint32(0xFF)).astype(np.uint8) for s in range(len(SUITS))]
+    plain = [plain_value[b] for b in suits]
+    shortness = [np.maximum(0, RUFF_LENGTH - length[b]) for b in suits]
+
+    table = np.empty((len(hands), COLUMNS), dtype=np.uint8)
+    table[:, column(Suit.NONE)] = np.minimum(sum(plain), MAX_STRENGTH)
+    for trump in range(len(SUITS)):
+        sides = [s for s in range(len(SUITS)) if s != trump]
+        total = trump_value[suits[trump]] + sum(plain[s] for s in sides)
+        ruffs = np.minimum(length[suits[trump]], sum(shortness[s] for s in sides))
+        table[:, trump] = np.minimum(total + RUFF_POINTS * ruffs, MAX_STRENGTH)
+    return table
+
+
+def build(path: Path) -> None:
+    # written next to the target and renamed, a loader never maps a half-written file
+    table = build_table(hands_in_order())
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_suffix(".partial")
+    with partial.open("wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, COLUMNS, HANDS))
+        table.tofile(file)
+    partial.replace(path)
+
+
+class HandStrengths:
+    # The table mapped read-only: pages are loaded on first touch and shared through the page cache
+    # by every process mapping the file, forked pool processes inherit the mapping itself. Single
+    # hands are sliced from the mapping directly, table is a numpy view of it for batches.
+    __slots__ = ("path", "table", "_buffer")
+
+    def __init__(self, path: Path, buffer: mmap.mmap) -> None:
+        self.path = path
+        self._buffer = buffer
+        self.table = np.frombuffer(buffer, dtype=np.uint8, count=HANDS * COLUMNS, offset=HEADER.size)
+        self.table = self.table.reshape(HANDS, COLUMNS)
+
+    @classmethod
+    def load(cls, path: str | Path) -> HandStrengths:
+        with open(path, "rb") as file:
+            magic, version, columns, hands = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION or columns != COLUMNS or hands != HANDS:
+                raise ValueError(f"{path} is not a hand strength table of version {VERSION}, rebuild it")
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(Path(path), buffer)
+
+    def of(self, hand: int, suit: Suit | None) -> int:
+        return self._buffer[HEADER.size + hand_index(hand) * COLUMNS + column(suit)]
+
+    def row(self, hand: int) -> bytes:
+        # every trump at once, SUITS order and then no trumps
+        start = HEADER.size + hand_index(hand) * COLUMNS
+        return self._buffer[start:start + COLUMNS]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the hand strength table")
+    parser.add_argument("path", type=Path, help=f"output file, the server reads DATA_DIR/{HAND_STRENGTH_FILE}")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    build(args.path)
+    print(f"{HANDS:,d} hands written to {args.path} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+import struct
+from pathlib import Path
+from threading import Event as ThreadEvent, Lock, Thread
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+import codec
+from bazar import BazarFSM
+
+logger = logging.getLogger(__name__)
+
+FSYNC_INTERVAL = 0.05  # seconds
+SNAPSHOT_INTERVAL = 60  # seconds
+READ_CHUNK = 1 << 20  # bytes
+
+# Both files are sequences of records: kind, table id length, table version, payload, table id.
+# Payload is codec.pack_event for events and codec.pack for snapshots.
+RECORD = struct.Struct("<BBII")
+MAX_TABLE_ID_BYTES = 255  # the id length is one byte of RECORD
+EVENT_RECORD = 1
+SNAPSHOT_RECORD = 2
+
+_LOG_NAME = "journal-{:06d}.log"
+_SNAPSHOT_NAME = "snapshot-{:06d}.bin"
+_SEGMENT_RE = re.compile(r"(journal|snapshot)-(\d{6})\.(log|bin)")
+
+
+def encode_record(kind: int, table_id: str, version: int, payload: int) -> bytes:
+    raw_id = table_id.encode()
+    if len(raw_id) > MAX_TABLE_ID_BYTES:
+        raise ValueError(f"table id is {len(raw_id)} bytes, at most {MAX_TABLE_ID_BYTES} can be journaled")
+    return RECORD.pack(kind, len(raw_id), version, payload) + raw_id
+
+
+def read_records(file: BinaryIO, chunk_size: int = READ_CHUNK) -> Iterator[tuple[int, str, int, int]]:
+    # stops at a torn record at the end, which is what a crash in the middle of write leaves behind
+    buffer = b""
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            return
+        buffer += chunk
+        offset = 0
+        end = len(buffer)
+        while offset + RECORD.size <= end:
+            kind, id_length, version, payload = RECORD.unpack_from(buffer, offset)
+            id_end = offset + RECORD.size + id_length
+            if id_end > end:
+                break
+            yield kind, buffer[offset + RECORD.size:id_end].decode(), version, payload
+            offset = id_end
+        buffer = buffer[offset:]
+
+
+class Journal:
+    # Append-only log of accepted table events with group commit: appends go to the OS right away,
+    # fsync happens at most every fsync_interval for everything written since the previous one.
+    # Snapshot n holds every table at the moment log segment n was opened, so recovery reads the
+    # newest snapshot and replays only the segments from n on.
+    def __init__(self, directory: str | Path, fsync_interval: float = FSYNC_INTERVAL) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fsync_interval = fsync_interval
+        self.appended = 0
+        self.fsyncs = 0
+        self._lock = Lock()
+        self._dirty = False
+        self._segment = max(self._segments("journal") + self._segments("snapshot"), default=0) + 1
+        self._file = open(self.directory / _LOG_NAME.format(self._segment), "ab")
+        self._stopped = ThreadEvent()
+        self._thread: Thread | None = None
+
+    def append(self, table_id: str, version: int, packed_event: int) -> None:
+        # packed_event is codec.pack_event, tables encode before they apply the event
+        record = encode_record(EVENT_RECORD, table_id, version, packed_event)
+        with self._lock:
+            self._file.write(record)
+            self._dirty = True
+            self.appended += 1
+
+    def sync(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._dirty = False
+            self.fsyncs += 1
+
+    def snapshot(self, tables: Iterable) -> None:
+        # tables are anything with id, version, fsm and lock, i.e. tables.Table
+        with self._lock:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._segment += 1
+            segment = self._segment
+            self._file = open(self.directory / _LOG_NAME.format(segment), "ab")
+            self._dirty = False
+
+        # events of a table between the rotation above and its capture below are in the new segment
+        # with version not above the captured one, recovery skips them
+        records = []
+        for table in tables:
+            with table.lock:
+                records.append(encode_record(
+                    SNAPSHOT_RECORD, table.id, table.version, codec.pack_fsm(table.fsm),
+                ))
+
+        path = self.directory / _SNAPSHOT_NAME.format(segment)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as file:
+            file.write(b"".join(records))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, path)
+
+        for kind in "journal", "snapshot":
+            for old in self._segments(kind):
+                if old < segment:
+                    self._path(kind, old).unlink()
+
+    def recover(self) -> dict[str, tuple[int, BazarFSM]]:
+        # table id -> (version, fsm) as of the last durable record
+        snapshots = [s for s in self._segments("snapshot") if s < self._segment]
+        start = max(snapshots, default=0)
+        recovered: dict[str, tuple[int, BazarFSM]] = {}
+        if start:
+            with open(self._path("snapshot", start), "rb") as file:
+                for _, table_id, version, position in read_records(file):
+                    recovered[table_id] = (version, codec.unpack_fsm(position, compiled=True))
+
+        for segment in self._segments("journal"):
+            if segment < start or segment >= self._segment:
+                continue
+            with open(self._path("journal", segment), "rb") as file:
+                for _, table_id, version, payload in read_records(file):
+                    current_version, fsm = recovered.get(table_id) or (0, BazarFSM(compiled=True))
+                    if version <= current_version:
+                        continue
+                    event, data = codec.unpack_event(payload)
+                    if not fsm.try_handle_event(event, data):
+                        logger.error("Journal event %s %s rejected on table %r", event, data, table_id)
+                        continue
+                    recovered[table_id] = (version, fsm)
+        return recovered
+
+    def start(self, tables: Callable[[], Iterable], snapshot_interval: float = SNAPSHOT_INTERVAL) -> None:
+        self._thread = Thread(target=self._run, args=(tables, snapshot_interval), name="Journal", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.sync()
+
+    def close(self) -> None:
+        self.stop()
+        with self._lock:
+            self._file.close()
+
+    def _run(self, tables: Callable[[], Iterable], snapshot_interval: float) -> None:
+        waited = 0.0
+        while not self._stopped.wait(self.fsync_interval):
+            try:
+                self.sync()
+                waited += self.fsync_interval
+                if waited >= snapshot_interval:
+                    waited = 0.0
+                    self.snapshot(tables())
+            except Exception:
+                logger.exception("Exception raised while writing journal")
+
+    def _segments(self, kind: str) -> list[int]:
+        segments = []
+        for path in self.directory.iterdir():
+            match = _SEGMENT_RE.fullmatch(path.name)
+            if match and match.group(1) == kind:
+                segments.append(int(match.group(2)))
+        return sorted(segments)
+
+    def _path(self, kind: str, segment: int) -> Path:
+        return self.directory / (_LOG_NAME if kind == "journal" else _SNAPSHOT_NAME).format(segment)
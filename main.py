@@ -1,29 +1,82 @@
 from __future__ import annotations
 
+import re
 import typing
-from threading import Timer
+from collections import Counter
+from enum import auto
+from pathlib import Path
+from threading import Lock
 
+from aiohttp import web
 from lona import LonaApp
 from lona.events.input_event import InputEvent
-from lona.events.view_event import ViewEvent
-from lona.html import HTML, Div, Node
+from lona.exceptions import StopReason
+from lona.html import HTML, Div, Node, Table, Tr, Th, Td
 from lona.request import Request
 from lona.server import LonaServer
 from lona.static_files import StyleSheet
 from lona.view import LonaView
 from lona.view_runtime import ViewRuntime
 
-from bazar import Player, BazarFSM, MIN_BET
-from common import Location
+import api
+from bazar import Player, BazarFSM
+from bot import BiddingBot, BotSeat
+from broadcast import Broadcaster
+from common import AutoName, Location
+from hand_strength import HAND_STRENGTH_FILE, HandStrengths
+from journal import Journal
+from metrics import BotMetrics, TransitionMetrics
+from sharding import ShardedTableRegistry
+from spectators import SpectatorHub, TableDisplay
+from tables import TableRegistry, RECONTRA_TIMEOUT
+from timers import TimerWheel, Timeout
 from widgets.bet_widget import BetWidget
 from widgets.player_widget import PlayerWidget
 
-RECONTRA_TIMEOUT = 10  # seconds
+DEFAULT_TABLE = "default"
+DATA_DIR = "data"
+METRICS = True  # count and time every table event, exported at /metrics
+WORKERS = 0  # host tables in this many worker processes, 0 keeps them in the server process
+# table views hold no thread between input events and broadcasts, so open tabs are bounded by memory;
+# False parks a runtime thread per tab as lona daemon views do (MAX_RUNTIME_THREADS of them at most)
+EVENT_DRIVEN_VIEWS = True
+BOT_PROCESSES = 2  # simulate for bot seats in this many processes, 0 disables bots
 
 app = LonaApp(__file__)
 
 app.settings.STATIC_DIRS.append("static")
 
+# widget updates done and skipped because their inputs didn't change since last render
+render_stats: Counter[str] = Counter()
+render_stats_lock = Lock()  # views render on many threads
+
+
+class BetView(AutoName):
+    FULL = auto()
+    CONTRA = auto()
+    RECONTRA = auto()
+    TIMER = auto()
+    HIDDEN = auto()
+
+
+timers = TimerWheel()
+broadcaster = Broadcaster(timers)
+metrics = TransitionMetrics()
+bot_metrics = BotMetrics()
+bot: BiddingBot | None = None
+bot_seats: dict[tuple[str, Player], BotSeat] = {}
+journal: Journal | None = None
+tables: TableRegistry | ShardedTableRegistry = TableRegistry(timers, RECONTRA_TIMEOUT, broadcaster.publish)
+spectators = SpectatorHub(tables, broadcaster)
+
+
+def send_patches(view: LonaView) -> None:
+    # lona sends widget changes on its own only after input event handlers
+    try:
+        view.show()
+    except StopReason:
+        pass  # tab closed while the change was on its way
+
 
 def make_first(arr, elem):
     l = list(arr)
@@ -32,31 +85,33 @@ def make_first(arr, elem):
 
 
 @app.route("/")
+@app.route("/table/<table_id>")
 class MultiplayerBazarViewOnePage(LonaView):
     def handle_request(self, request: Request) -> HTML:
+        table_id = request.match_info.get("table_id", DEFAULT_TABLE)
         return HTML(
-            Node(tag_name="iframe", src="/bazar/player/A", style={
+            Node(tag_name="iframe", src=f"/table/{table_id}/player/A", style={
                 "position": "absolute",
                 "inset": "0 50% 50% 0",
                 "width": "50%",
                 "height": "50%",
                 "border": "10px black solid",
             }),
-            Node(tag_name="iframe", src="/bazar/player/B", style={
+            Node(tag_name="iframe", src=f"/table/{table_id}/player/B", style={
                 "position": "absolute",
                 "inset": "0 0 50% 50%",
                 "width": "50%",
                 "height": "50%",
                 "border": "10px black solid",
             }),
-            Node(tag_name="iframe", src="/bazar/player/C", style={
+            Node(tag_name="iframe", src=f"/table/{table_id}/player/C", style={
                 "position": "absolute",
                 "inset": "50% 50% 0 0",
                 "width": "50%",
                 "height": "50%",
                 "border": "10px black solid",
             }),
-            Node(tag_name="iframe", src="/bazar/player/D", style={
+            Node(tag_name="iframe", src=f"/table/{table_id}/player/D", style={
                 "position": "absolute",
                 "inset": "50% 0 0 50%",
                 "width": "50%",
@@ -66,7 +121,71 @@ class MultiplayerBazarViewOnePage(LonaView):
         )
 
 
+@app.route("/tables")
+class TablesView(LonaView):
+    def handle_request(self, request: Request) -> HTML:
+        usage = tables.memory_usage()
+        with render_stats_lock:
+            rendered, skipped = render_stats["rendered"], render_stats["skipped"]
+        return HTML(
+            Table(
+                Tr(Th("Table"), Th("Memory, bytes")),
+                *(Tr(Td(table_id), Td(str(size))) for table_id, size in sorted(usage.items())),
+                Tr(Th("Total"), Th(str(sum(usage.values())))),
+            ),
+            Table(
+                Tr(Th("Widget updates rendered"), Td(str(rendered))),
+                Tr(Th("Widget updates skipped"), Td(str(skipped))),
+            ),
+        )
+
+
+@app.route("/metrics", interactive=False)
+class MetricsView(LonaView):
+    def handle_request(self, request: Request) -> dict:
+        return {"content_type": "text/plain", "text": metrics.prometheus_text() + bot_metrics.prometheus_text()}
+
+
+# http pass through views get the plain aiohttp request without lona's match info
+API_PATH = re.compile(r"/api/table/(?P<table_id>[^/]+)(?:/player/(?P<player>[ABCD]))?")
+
+
+@app.route("/api/table/<table_id>", http_pass_through=True)
+@app.route("/api/table/<table_id>/player/<player>", http_pass_through=True)
+async def api_table(request: web.Request) -> web.StreamResponse:
+    match = API_PATH.fullmatch(request.path)
+    if match is None:
+        raise web.HTTPNotFound()
+    player = match.group("player")
+    return await api.serve(request, tables, broadcaster, match.group("table_id"), player and Player[player])
+
+
+BOT_PATH = re.compile(r"/api/table/(?P<table_id>[^/]+)/bot/(?P<player>[ABCD])")
+
+
+# POST seats a bot, DELETE takes it away
+@app.route("/api/table/<table_id>/bot/<player>", http_pass_through=True)
+async def api_bot(request: web.Request) -> web.StreamResponse:
+    match = BOT_PATH.fullmatch(request.path)
+    if match is None:
+        raise web.HTTPNotFound()
+    if bot is None:
+        raise web.HTTPServiceUnavailable(text="bots are disabled")
+    key = (match.group("table_id"), Player[match.group("player")])
+    if request.method == "POST":
+        if key not in bot_seats:
+            bot_seats[key] = BotSeat(bot, tables, broadcaster, *key)
+    elif request.method == "DELETE":
+        seat = bot_seats.pop(key, None)
+        if seat is not None:
+            seat.close()
+    else:
+        raise web.HTTPMethodNotAllowed(request.method, ["POST", "DELETE"])
+    return web.json_response({"table": key[0], "player": key[1].name, "bot": key in bot_seats})
+
+
 @app.route("/bazar/player/<player>")
+@app.route("/table/<table_id>/player/<player>")
 class MultiplayerBazarView(LonaView):
     STATIC_FILES = [
         StyleSheet("style.css", "static/style.css"),
@@ -75,14 +194,9 @@ class MultiplayerBazarView(LonaView):
     def __init__(self, server: LonaServer, view_runtime: ViewRuntime, request: Request) -> None:
         super().__init__(server, view_runtime, request)
 
-        if "bazar" not in self.server.state:
-            self.server.state["bazar"] = {
-                "fsm": BazarFSM(),
-                "timer": None,
-                "player_said": {p: ("", 0) for p in Player},
-                "waiting_player": Player.A,
-            }
-        self.server_state = self.server.state["bazar"]
+        self.table = tables.join(request.match_info.get("table_id", DEFAULT_TABLE))
+        self.rendered_version = -1
+        self._rendered: dict[typing.Hashable, tuple] = {}  # last arguments passed to each widget
         self.player: Player = {
             "A": Player.A,
             "B": Player.B,
@@ -111,120 +225,194 @@ class MultiplayerBazarView(LonaView):
 
     @property
     def fsm(self) -> BazarFSM:
-        return self.server_state["fsm"]
+        return self.table.fsm
 
     @property
-    def timer(self) -> Timer:
-        return self.server_state["timer"]
-
-    @timer.setter
-    def timer(self, timer: Timer) -> None:
-        self.server_state["timer"] = timer
+    def timer(self) -> Timeout | None:
+        return self.table.timer
 
     @property
     def player_said(self) -> dict[Player, tuple[str | HTML, int]]:
-        return self.server_state["player_said"]
+        return self.table.player_said
 
     @property
     def waiting_player(self) -> Player | None:
-        return self.server_state["waiting_player"]
-
-    @waiting_player.setter
-    def waiting_player(self, player: Player | None) -> None:
-        self.server_state["waiting_player"] = player
+        return self.table.waiting_player
 
     def update_state(self) -> None:
-        with self.html.lock:
-            for p, w in self.players.items():
-                w.said(*self.player_said[p])
-                w.should_act(p == self.waiting_player)
-
-            if self.waiting_player == self.player:
-                self.bet_widget.show_full(
-                    MIN_BET if self.fsm.memory.last_bet_amount is None else self.fsm.memory.last_bet_amount + 1,
+        # derive everything under the table lock, then touch only widgets whose inputs changed
+        with self.table.lock:
+            version = self.table.version
+            said = {p: self.player_said[p] for p in self.players}
+            waiting_player = self.waiting_player
+            legal = self.fsm.legal_actions(self.player)
+            if waiting_player == self.player:
+                bet = (
+                    BetView.FULL,
+                    legal.min_capo_bet if legal.min_bet is None else legal.min_bet,
                     self.fsm.memory.capo,
-                    self.fsm.can_contra(self.player),
+                    legal.contra,
                 )
-            elif self.fsm.can_contra(self.player):
-                self.bet_widget.show_contra()
-            elif self.fsm.can_recontra(self.player):
-                self.bet_widget.show_recontra()
+            elif legal.contra:
+                bet = (BetView.CONTRA,)
+            elif legal.recontra:
+                bet = (BetView.RECONTRA,)
             elif self.timer is not None:
-                self.bet_widget.show_timer()
+                bet = (BetView.TIMER,)
             else:
-                self.bet_widget.hide()
-
-    def notify_changes(self) -> None:
-        self.fire_view_event("state changed")
+                bet = (BetView.HIDDEN,)
 
-    def on_view_event(self, event: ViewEvent) -> None:
+        with self.html.lock:
+            # refreshes run concurrently on lona's worker pool, an older snapshot must not win
+            if version < self.rendered_version:
+                return
+            self.rendered_version = version
+            rendered = []
+            for p, w in self.players.items():
+                rendered.append(self._render(("said", p), said[p], w.said))
+                rendered.append(self._render(("should_act", p), (p == waiting_player,), w.should_act))
+            rendered.append(self._render("bet", bet, self._render_bet))
+        with render_stats_lock:
+            render_stats["rendered"] += sum(rendered)
+            render_stats["skipped"] += len(rendered) - sum(rendered)
+
+    def _render(self, key: typing.Hashable, args: tuple, render: typing.Callable[..., None]) -> bool:
+        if self._rendered.get(key) == args:
+            return False
+        self._rendered[key] = args
+        render(*args)
+        return True
+
+    def _render_bet(self, view: BetView, *args) -> None:
+        if view == BetView.FULL:
+            self.bet_widget.show_full(*args)
+        elif view == BetView.CONTRA:
+            self.bet_widget.show_contra()
+        elif view == BetView.RECONTRA:
+            self.bet_widget.show_recontra()
+        elif view == BetView.TIMER:
+            self.bet_widget.show_timer()
+        else:
+            self.bet_widget.hide()
+
+    def refresh(self) -> None:
         self.update_state()
+        send_patches(self)
 
-    def handle_request(self, request: Request) -> typing.NoReturn:
-        self.daemonize()
+    def on_table_changed(self, version: int) -> None:
+        with self.html.lock:
+            stale = version > self.rendered_version
+        if stale:
+            self.server.run_function_async(self.refresh)
+
+    def on_cleanup(self) -> None:
+        broadcaster.unsubscribe(self.table.id, self.on_table_changed)
+        tables.leave(self.table)
+
+    def handle_request(self, request: Request) -> HTML:
+        broadcaster.subscribe(self.table.id, self.on_table_changed)
         self.update_state()
+        if EVENT_DRIVEN_VIEWS:
+            # lona shows the returned html and keeps the view for input events until the tab closes
+            return self.html
+        self.daemonize()
         self.show(self.html)
         # need not to return to demonize view
         while True:
             self.sleep(10)
 
-    def say(self, text: str) -> None:
-        self.player_said[self.player] = (text, self.player_said[self.player][1] + 1)
-
     def handle_bet(self, event: InputEvent) -> None:
-        suit = self.bet_widget.suit
-        amount = self.bet_widget.amount
-        capo = self.bet_widget.capo
-        if self.fsm.can_bet(self.player, suit, amount, capo):
-            self.fsm.handle_bet(self.player, suit, amount, capo)
-            if capo:
-                self.say(f"{suit.value}{amount}<sup>cp</sup>")
-            else:
-                self.say(f"{suit.value}{amount}")
-            self.waiting_player = self.fsm.memory.current_player
-            self.notify_changes()
+        self.table.bet(self.player, self.bet_widget.suit, self.bet_widget.amount, self.bet_widget.capo)
 
     def handle_pass(self, event: InputEvent) -> None:
-        if self.fsm.can_pass(self.player):
-            can_continue = self.fsm.handle_pass(self.player)
-            self.say("Pass")
-            if can_continue:
-                self.waiting_player = self.fsm.memory.current_player
-            else:
-                self.waiting_player = None
-            self.notify_changes()
+        self.table.pass_(self.player)
 
     def handle_contra(self, event: InputEvent) -> None:
-        if self.fsm.can_contra(self.player):
-            self.fsm.handle_contra(self.player)
-            self.start_recontra_timer()
-            self.say("Contra")
-            self.waiting_player = None
-            self.notify_changes()
+        self.table.contra(self.player)
 
     def handle_recontra(self, event: InputEvent) -> None:
-        if self.fsm.can_recontra(self.player):
-            self.cancel_timer()
-            self.fsm.handle_recontra(self.player)
-            self.say("Recontra")
-            self.waiting_player = None
-            self.notify_changes()
-
-    def start_recontra_timer(self) -> None:
-        def fn():
-            if self.fsm.can_timeout():
-                self.fsm.handle_timeout()
-            self.timer = None
-            self.notify_changes()
-
-        self.timer = Timer(RECONTRA_TIMEOUT, fn)
-        self.timer.start()
-        self.notify_changes()
-
-    def cancel_timer(self) -> None:
-        self.timer.cancel()
-        self.timer = None
-        self.notify_changes()
-
-
-app.run(port=8085, log_level="debug")
+        self.table.recontra(self.player)
+
+
+@app.route("/watch")
+@app.route("/table/<table_id>/watch")
+class SpectatorView(LonaView):
+    STATIC_FILES = [
+        StyleSheet("style.css", "static/style.css"),
+    ]
+
+    def __init__(self, server: LonaServer, view_runtime: ViewRuntime, request: Request) -> None:
+        super().__init__(server, view_runtime, request)
+
+        self.table_id = request.match_info.get("table_id", DEFAULT_TABLE)
+        self.shown: TableDisplay | None = None
+        self.players: dict[Player, PlayerWidget] = {
+            player: PlayerWidget(player.value, pos, player == Player.A)
+            for player, pos in zip(Player, [Location.BOTTOM, Location.LEFT, Location.TOP, Location.RIGHT])
+        }
+        self.status = Div(_class="spectator-status")
+        self.html = HTML(
+            Div(
+                *self.players.values(),
+                self.status,
+            ),
+        )
+
+    def show_display(self, display: TableDisplay) -> None:
+        # display is shared by every spectator of the table, only the widgets are ours
+        with self.html.lock:
+            shown = self.shown
+            if shown is not None and display.version <= shown.version:
+                return
+            self.shown = display
+            for p, w in self.players.items():
+                if shown is None or shown.said[p] != display.said[p]:
+                    w.said(*display.said[p])
+                if shown is None or (p == shown.waiting_player) != (p == display.waiting_player):
+                    w.should_act(p == display.waiting_player)
+            if shown is None or shown.status != display.status:
+                self.status.set_text(display.status)
+
+    def refresh(self, display: TableDisplay) -> None:
+        self.show_display(display)
+        send_patches(self)
+
+    def on_display_changed(self, display: TableDisplay) -> None:
+        self.server.run_function_async(self.refresh, display)
+
+    def on_cleanup(self) -> None:
+        spectators.unwatch(self.table_id, self.on_display_changed)
+
+    def handle_request(self, request: Request) -> HTML:
+        self.show_display(spectators.watch(self.table_id, self.on_display_changed))
+        if EVENT_DRIVEN_VIEWS:
+            return self.html
+        self.daemonize()
+        self.show(self.html)
+        # need not to return to demonize view
+        while True:
+            self.sleep(10)
+
+
+if __name__ == "__main__":
+    # importing main, e.g. from benchmarks, must not fork workers, open the journal or start the server
+    if WORKERS:
+        # every worker journals its own tables under DATA_DIR/worker-N
+        tables = ShardedTableRegistry(WORKERS, RECONTRA_TIMEOUT, broadcaster.publish, journal_directory=DATA_DIR)
+        spectators = SpectatorHub(tables, broadcaster)
+    else:
+        journal = tables.journal = Journal(DATA_DIR)
+        tables.restore(journal.recover())
+        journal.start(tables.values)
+    if BOT_PROCESSES and not WORKERS:
+        # forked before the timer and server threads start; bot seats read the table under
+        # its lock, which remote tables don't have
+        # built offline with python -m hand_strength data/hand_strength.bin, mapped by every pool process
+        strengths_path = Path(DATA_DIR) / HAND_STRENGTH_FILE
+        strengths = HandStrengths.load(strengths_path) if strengths_path.exists() else None
+        bot = BiddingBot(BOT_PROCESSES, metrics=bot_metrics, strengths=strengths)
+    if METRICS:
+        # after recovery, replayed events aren't traffic; worker processes aren't instrumented
+        BazarFSM.hooks = metrics
+    timers.start()
+    app.run(port=8085, log_level="debug")
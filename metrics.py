@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import bisect
+from collections import Counter
+from enum import Enum
+from threading import Lock
+from typing import Any
+
+from fsm import FSM, FSMHooks, Rejection
+
+# upper bounds of latency histogram buckets, seconds
+LATENCY_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3, 1e-2)
+DECISION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5)
+
+
+def _label(value: Any) -> str:
+    text = value.name if isinstance(value, Enum) else str(value)
+    return text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class TransitionMetrics(FSMHooks):
+    # Per (state, event) counters of accepted and, by reason, rejected events and latency histograms of
+    # accepted ones, exported in Prometheus text format. Install with BazarFSM.hooks = metrics.
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS, prefix: str = "fsm") -> None:
+        self.buckets = buckets
+        self.prefix = prefix
+        # keyed by the states and events themselves, they become labels on export
+        self.transitions: Counter[tuple[Any, Any, Any]] = Counter()  # (from, event, to)
+        self.rejected_events: Counter[tuple[Any, Any, str]] = Counter()  # (state, event, reason)
+        self._histograms: dict[tuple[Any, Any], list[int]] = {}  # per bucket counts, last one is +Inf
+        self._sums: Counter[tuple[Any, Any]] = Counter()
+        self._lock = Lock()
+
+    def post_transition(self, fsm: FSM, from_: Any, to: Any, event: Any, data: Any, seconds: float) -> None:
+        key = (from_, event)
+        bucket = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.transitions[(from_, event, to)] += 1
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1)
+            histogram[bucket] += 1
+            self._sums[key] += seconds
+
+    def rejected(self, fsm: FSM, event: Any, data: Any, rejection: Rejection) -> None:
+        # failed conditions if any, e.g. "is_current_player", otherwise "TERMINAL" or "NOT_POSSIBLE"
+        reason = ",".join(rejection.conditions) or rejection.reason.name
+        with self._lock:
+            self.rejected_events[(rejection.state, event, reason)] += 1
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            transitions = sorted((tuple(map(_label, key)), n) for key, n in self.transitions.items())
+            rejected = sorted((tuple(map(_label, key)), n) for key, n in self.rejected_events.items())
+            histograms = sorted(
+                (tuple(map(_label, key)), list(counts), self._sums[key]) for key, counts in self._histograms.items()
+            )
+
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_transitions_total Events accepted, by state before, event and state after.",
+            f"# TYPE {p}_transitions_total counter",
+        ]
+        for (from_, event, to), n in transitions:
+            lines.append(f'{p}_transitions_total{{state="{from_}",event="{event}",to="{to}"}} {n}')
+
+        lines += [
+            f"# HELP {p}_rejected_total Events rejected, by state, event and reason.",
+            f"# TYPE {p}_rejected_total counter",
+        ]
+        for (state, event, reason), n in rejected:
+            lines.append(f'{p}_rejected_total{{state="{state}",event="{event}",reason="{reason}"}} {n}')
+
+        lines += [
+            f"# HELP {p}_transition_seconds Time to check and apply an accepted event.",
+            f"# TYPE {p}_transition_seconds histogram",
+        ]
+        for (state, event), counts, total in histograms:
+            labels = f'state="{state}",event="{event}"'
+            cumulative = 0
+            for le, n in zip([*map(repr, self.buckets), "+Inf"], counts):
+                cumulative += n
+                lines.append(f'{p}_transition_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{p}_transition_seconds_sum{{{labels}}} {total!r}")
+            lines.append(f"{p}_transition_seconds_count{{{labels}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+class BotMetrics:
+    # Decisions of bidding bots by action, their latency and the rollouts simulated for them.
+    # Rollouts per second is the rate of the rollouts counter, the gauge is the last decision's.
+    def __init__(self, buckets: tuple[float, ...] = DECISION_BUCKETS, prefix: str = "bot") -> None:
+        self.buckets = buckets
+        self.prefix = prefix
+        self.decisions: Counter[Any] = Counter()  # by event, None for waiting
+        self.rollouts = 0
+        self.last_rollouts_per_second = 0.0
+        self._histogram = [0] * (len(buckets) + 1)  # last one is +Inf
+        self._sum = 0.0
+        self._lock = Lock()
+
+    def decided(self, event: Any, seconds: float, rollouts: int) -> None:
+        bucket = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.decisions[event] += 1
+            self.rollouts += rollouts
+            self.last_rollouts_per_second = rollouts / seconds if seconds > 0 else 0.0
+            self._histogram[bucket] += 1
+            self._sum += seconds
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            decisions = sorted(("WAIT" if event is None else _label(event), n) for event, n in self.decisions.items())
+            rollouts = self.rollouts
+            rate = self.last_rollouts_per_second
+            counts = list(self._histogram)
+            total = self._sum
+
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_decisions_total Bot decisions, by action taken.",
+            f"# TYPE {p}_decisions_total counter",
+        ]
+        for action, n in decisions:
+            lines.append(f'{p}_decisions_total{{action="{action}"}} {n}')
+        lines += [
+            f"# HELP {p}_rollouts_total Deals simulated for bot decisions.",
+            f"# TYPE {p}_rollouts_total counter",
+            f"{p}_rollouts_total {rollouts}",
+            f"# HELP {p}_rollouts_per_second Rollouts per second of the last decision.",
+            f"# TYPE {p}_rollouts_per_second gauge",
+            f"{p}_rollouts_per_second {rate!r}",
+            f"# HELP {p}_decision_seconds Time from question to answer of a bot decision.",
+            f"# TYPE {p}_decision_seconds histogram",
+        ]
+        cumulative = 0
+        for le, n in zip([*map(repr, self.buckets), "+Inf"], counts):
+            cumulative += n
+            lines.append(f'{p}_decision_seconds_bucket{{le="{le}"}} {cumulative}')
+        lines.append(f"{p}_decision_seconds_sum {total!r}")
+        lines.append(f"{p}_decision_seconds_count {cumulative}")
+        return "\n".join(lines) + "\n"
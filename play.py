@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import random
+
+from bazar import BazarFSM, Player, State, Team
+from common import Suit
+
+# Trick play after the auction, cards and card sets as bits of a 32-bit int.
+# Card index is suit * 8 + rank: suits in the order of Suit without NONE, ranks in
+# plain (non-trump) order, so within a suit a higher bit is a stronger plain card.
+#
+# Rules: follow the led suit if possible. When trumps are led, a higher trump has to be
+# played if possible. Without the led suit a trump has to be played, higher than a trump
+# already in the trick if possible; without trumps any card goes. Suit.NONE is no trumps.
+
+RANKS = ("7", "8", "9", "J", "Q", "K", "10", "A")
+SUITS: tuple[Suit, ...] = tuple(s for s in Suit if s != Suit.NONE)
+SUIT_CODES = {s: i for i, s in enumerate(SUITS)}
+NO_TRUMP = -1
+CARDS = 32
+HAND_SIZE = 8
+TRICKS = 8
+LAST_TRICK_BONUS = 10
+SEATS: tuple[Player, ...] = tuple(Player)
+_TEAM_CODES = {t: i for i, t in enumerate(Team)}
+SEAT_TEAMS = tuple(_TEAM_CODES[p.team] for p in SEATS)
+
+FULL_DECK = (1 << CARDS) - 1
+SUIT_MASKS = tuple(0xFF << (8 * s) for s in range(len(SUITS)))
+SUIT_OF = tuple(card >> 3 for card in range(CARDS))
+
+# strength of each rank, index into RANKS order
+_PLAIN_STRENGTH = (0, 1, 2, 3, 4, 5, 6, 7)  # 7 8 9 J Q K 10 A
+_TRUMP_STRENGTH = (0, 1, 6, 7, 2, 3, 4, 5)  # 7 8 Q K 10 A 9 J
+_PLAIN_POINTS = (0, 0, 0, 2, 3, 4, 10, 11)
+_TRUMP_POINTS = (0, 0, 14, 20, 3, 4, 10, 11)
+
+
+def _above(strength: tuple[int, ...]) -> tuple[int, ...]:
+    # per rank, the ranks of the same suit that beat it, as an 8-bit mask
+    return tuple(
+        sum(1 << other for other in range(len(RANKS)) if strength[other] > strength[rank])
+        for rank in range(len(RANKS))
+    )
+
+
+_PLAIN_ABOVE = _above(_PLAIN_STRENGTH)
+_TRUMP_ABOVE = _above(_TRUMP_STRENGTH)
+
+
+def _beating(trump: int) -> tuple[int, ...]:
+    # per card that currently wins a trick, all cards that would take the trick from it
+    trumps = 0 if trump == NO_TRUMP else SUIT_MASKS[trump]
+    beating = []
+    for card in range(CARDS):
+        suit, rank = divmod(card, 8)
+        if suit == trump:
+            beating.append(_TRUMP_ABOVE[rank] << (8 * suit))
+        else:
+            beating.append(_PLAIN_ABOVE[rank] << (8 * suit) | trumps)
+    return tuple(beating)
+
+
+# BEATING[trump + 1][best], index 0 is no trumps
+BEATING: tuple[tuple[int, ...], ...] = tuple(_beating(trump) for trump in range(NO_TRUMP, len(SUITS)))
+
+
+def _byte_points(points: tuple[int, ...]) -> tuple[int, ...]:
+    return tuple(sum(points[rank] for rank in range(8) if byte >> rank & 1) for byte in range(256))
+
+
+_PLAIN_BYTE_POINTS = _byte_points(_PLAIN_POINTS)
+_TRUMP_BYTE_POINTS = _byte_points(_TRUMP_POINTS)
+# BYTE_POINTS[trump + 1][suit], card points of any subset of one suit given as its byte
+BYTE_POINTS: tuple[tuple[tuple[int, ...], ...], ...] = tuple(
+    tuple(_TRUMP_BYTE_POINTS if suit == trump else _PLAIN_BYTE_POINTS for suit in range(len(SUITS)))
+    for trump in range(NO_TRUMP, len(SUITS))
+)
+
+
+def card(suit: Suit, rank: str) -> int:
+    return SUIT_CODES[suit] * 8 + RANKS.index(rank)
+
+
+def card_name(card_: int) -> str:
+    return f"{RANKS[card_ & 7]}{SUITS[card_ >> 3].value}"
+
+
+def trump_code(suit: Suit | None) -> int:
+    return NO_TRUMP if suit is None or suit == Suit.NONE else SUIT_CODES[suit]
+
+
+def cards_of(mask: int) -> list[int]:
+    cards = []
+    while mask:
+        low = mask & -mask
+        cards.append(low.bit_length() - 1)
+        mask ^= low
+    return cards
+
+
+def points(mask: int, trump: int) -> int:
+    # card points of a set of cards, one table lookup per suit
+    table = BYTE_POINTS[trump + 1]
+    return (
+        table[0][mask & 0xFF]
+        + table[1][mask >> 8 & 0xFF]
+        + table[2][mask >> 16 & 0xFF]
+        + table[3][mask >> 24 & 0xFF]
+    )
+
+
+def legal_cards(hand: int, led: int, best: int, trump: int) -> int:
+    # led is the suit of the first card of the trick or NO_TRUMP on an empty trick,
+    # best is the card winning the trick so far
+    if led == NO_TRUMP:
+        return hand
+    follow = hand & SUIT_MASKS[led]
+    if trump == NO_TRUMP:
+        return follow or hand
+    if led == trump:
+        return (follow & BEATING[trump + 1][best]) or follow or hand
+    if follow:
+        return follow
+    trumps = hand & SUIT_MASKS[trump]
+    if not trumps:
+        return hand
+    if SUIT_OF[best] == trump:
+        return (trumps & BEATING[trump + 1][best]) or trumps
+    return trumps
+
+
+def deal(rng: random.Random) -> list[int]:
+    deck = list(range(CARDS))
+    rng.shuffle(deck)
+    return [sum(1 << c for c in deck[i * HAND_SIZE:(i + 1) * HAND_SIZE]) for i in range(len(SEATS))]
+
+
+class TrickPlay:
+    # One deal played out trick by trick. Seats are indexes into SEATS, teams into Team.
+    __slots__ = (
+        "trump", "hands", "seat", "led", "best", "best_seat", "trick", "played",
+        "team_points", "team_tricks", "tricks_played", "history",
+    )
+
+    def __init__(self, hands: list[int], trump: int, leader: int = 0) -> None:
+        self.trump = trump
+        self.hands = list(hands)
+        self.seat = leader
+        self.led = NO_TRUMP  # suit of the current trick, NO_TRUMP before its first card
+        self.best = 0
+        self.best_seat = leader
+        self.trick = 0  # cards of the current trick
+        self.played = 0  # cards of finished tricks
+        self.team_points = [0, 0]
+        self.team_tricks = [0, 0]
+        self.tricks_played = 0
+        self.history: list[int] = []  # cards in the order played
+
+    @classmethod
+    def after_auction(cls, fsm: BazarFSM, hands: list[int], leader: Player = Player.A) -> TrickPlay:
+        if fsm.current_state != State.PLAY:
+            raise ValueError(f"auction is not finished: {fsm.current_state}")
+        return cls(hands, trump_code(fsm.memory.last_bet_suit), SEATS.index(leader))
+
+    @property
+    def is_over(self) -> bool:
+        return self.tricks_played == TRICKS
+
+    def legal_cards(self) -> int:
+        return legal_cards(self.hands[self.seat], self.led, self.best, self.trump)
+
+    def play(self, card_: int) -> None:
+        bit = 1 << card_
+        if not self.legal_cards() & bit:
+            raise ValueError(f"{card_name(card_)} is not a legal card for {SEATS[self.seat].value}")
+        self.hands[self.seat] ^= bit
+        self.history.append(card_)
+        if self.led == NO_TRUMP:
+            self.led = SUIT_OF[card_]
+            self.best = card_
+            self.best_seat = self.seat
+        elif bit & BEATING[self.trump + 1][self.best]:
+            self.best = card_
+            self.best_seat = self.seat
+        self.trick |= bit
+        if len(self.history) & 3:
+            self.seat = (self.seat + 1) & 3
+            return
+
+        # trick complete, winner leads the next one
+        team = SEAT_TEAMS[self.best_seat]
+        self.team_points[team] += points(self.trick, self.trump)
+        self.team_tricks[team] += 1
+        self.tricks_played += 1
+        if self.tricks_played == TRICKS:
+            self.team_points[team] += LAST_TRICK_BONUS
+        self.played |= self.trick
+        self.trick = 0
+        self.led = NO_TRUMP
+        self.seat = self.best_seat
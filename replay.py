@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import argparse
+import zlib
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+import codec
+from bazar import BazarFSM, Event, EventData, Memory, Player, State
+from journal import EVENT_RECORD, SNAPSHOT_RECORD, encode_record, read_records
+
+# Replays journal-format files without tables, views or timers. Event records are applied in order,
+# a snapshot record for a table is the recorded outcome: the position the table must be in at that version.
+# Journal segments and snapshots, as well as recordings made by write_recording, can be replayed.
+
+
+@dataclass
+class Mismatch:
+    table_id: str
+    version: int
+    expected: str
+    actual: str
+
+
+@dataclass
+class ReplayReport:
+    events: int = 0
+    checked: int = 0
+    auctions: int = 0
+    mismatches: list[Mismatch] = field(default_factory=list)
+
+    def merge(self, other: ReplayReport) -> None:
+        self.events += other.events
+        self.checked += other.checked
+        self.auctions += other.auctions
+        self.mismatches.extend(other.mismatches)
+
+
+def iter_records(paths: Iterable[str | Path]) -> Iterator[tuple[int, str, int, int]]:
+    for path in paths:
+        with open(path, "rb") as file:
+            yield from read_records(file)
+
+
+def in_shard(table_id: str, shard: int, shards: int) -> bool:
+    # crc32 is stable across processes unlike hash()
+    return zlib.crc32(table_id.encode()) % shards == shard
+
+
+def replay(records: Iterable[tuple[int, str, int, int]], shard: int = 0, shards: int = 1) -> ReplayReport:
+    report = ReplayReport()
+    live: dict[str, tuple[int, BazarFSM]] = {}
+    finished: dict[str, tuple[int, int]] = {}  # terminal tables are kept as packed positions only
+    pool: list[BazarFSM] = []  # FSMs of finished auctions are reused, building one is the expensive part
+
+    for kind, table_id, version, payload in records:
+        if shards > 1 and not in_shard(table_id, shard, shards):
+            continue
+
+        if kind == SNAPSHOT_RECORD:
+            if table_id in live:
+                actual_version, fsm = live[table_id]
+                actual = codec.pack_fsm(fsm)
+            elif table_id in finished:
+                actual_version, actual = finished[table_id]
+            else:
+                # auction starts from a snapshot, e.g. the first snapshot of a journal
+                fsm = pool.pop() if pool else BazarFSM(compiled=True)
+                fsm.current_state = codec.unpack_into(payload, fsm.memory)
+                live[table_id] = (version, fsm)
+                report.auctions += 1
+                continue
+            if version > actual_version:
+                # the table got further than the events replayed for it
+                report.mismatches.append(Mismatch(table_id, version, f"version {version}", f"version {actual_version}"))
+            elif version == actual_version:
+                report.checked += 1
+                if actual != payload:
+                    report.mismatches.append(Mismatch(table_id, version, _describe(payload), _describe(actual)))
+            # an older snapshot, e.g. of a journal replayed together with later segments, can't be compared
+            continue
+
+        if kind != EVENT_RECORD:
+            continue
+        report.events += 1
+        entry = live.get(table_id)
+        if entry is None:
+            if table_id in finished:
+                report.mismatches.append(Mismatch(table_id, version, "event accepted", "auction finished"))
+                continue
+            fsm = pool.pop() if pool else BazarFSM(compiled=True)
+            fsm.memory = Memory(current_player=Player.A)
+            fsm.current_state = State.NO_BET
+            entry = (0, fsm)
+            report.auctions += 1
+        current_version, fsm = entry
+        if version <= current_version:
+            continue  # already covered by the snapshot the auction started from
+        if version != current_version + 1:
+            # events in between are missing, the rest of the auction is replayed from where it is
+            report.mismatches.append(
+                Mismatch(table_id, version, f"version {current_version + 1}", f"version {version}"),
+            )
+        event, data = codec.unpack_event(payload)
+        if not fsm.try_handle_event(event, data):
+            report.mismatches.append(Mismatch(table_id, version, "event accepted", _describe(codec.pack_fsm(fsm))))
+            continue
+        if fsm.is_terminal:
+            live.pop(table_id, None)
+            finished[table_id] = (version, codec.pack_fsm(fsm))
+            pool.append(fsm)
+        else:
+            live[table_id] = (version, fsm)
+    return report
+
+
+def _replay_shard(args: tuple[list[str], int, int]) -> ReplayReport:
+    paths, shard, shards = args
+    return replay(iter_records(paths), shard, shards)
+
+
+def replay_files(paths: list[str | Path], processes: int = 1) -> ReplayReport:
+    # every process reads all files but replays only tables of its shard, so an auction split
+    # between journal segments is still replayed in order by one process
+    paths = [str(p) for p in paths]
+    if processes <= 1:
+        return replay(iter_records(paths))
+    report = ReplayReport()
+    with Pool(processes) as pool:
+        for shard_report in pool.imap_unordered(_replay_shard, [(paths, i, processes) for i in range(processes)]):
+            report.merge(shard_report)
+    return report
+
+
+def write_recording(file: BinaryIO, table_id: str, events: Iterable[tuple[Event, EventData]]) -> None:
+    # records an auction with the outcome of every event, rejected events are not recorded
+    fsm = BazarFSM(compiled=True)
+    version = 0
+    for event, data in events:
+        if not fsm.try_handle_event(event, data):
+            continue
+        version += 1
+        file.write(encode_record(EVENT_RECORD, table_id, version, codec.pack_event(event, data)))
+        file.write(encode_record(SNAPSHOT_RECORD, table_id, version, codec.pack_fsm(fsm)))
+
+
+def _describe(position: int) -> str:
+    state, memory = codec.unpack(position)
+    return f"{state.value} {memory}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay recorded bazar auctions and verify every recorded outcome")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--show", type=int, default=10, help="mismatches to print")
+    args = parser.parse_args()
+
+    report = replay_files(args.paths, args.processes)
+    for m in report.mismatches[:args.show]:
+        print(f"table {m.table_id!r} version {m.version}: expected {m.expected}, got {m.actual}")
+    print(f"auctions: {report.auctions}, events: {report.events}, checked: {report.checked}, "
+          f"mismatches: {len(report.mismatches)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from bazar import Memory, Player, Team
+from bazar_batch import NONE, PLAYER_CODES, BazarBatch
+from play import TRICKS, TrickPlay
+
+# Scores are game points, tens of card points. The team of the last bet has a contract of
+# last_bet_amount tens of card points, or with capo to take every trick. The contract is worth
+# its amount, doubled by contra and doubled again by recontra, and goes to the bidding team
+# if made, otherwise to the defenders. Without contra the defenders also score their own card
+# points rounded to tens. A redial, nobody bet, scores nothing.
+
+TEAMS: tuple[Team, ...] = tuple(Team)
+_TEAM_CODES = {t: i for i, t in enumerate(TEAMS)}
+# team code per player code
+PLAYER_TEAMS = np.array([_TEAM_CODES[p.team] for p in Player], dtype=np.int8)
+
+
+def rounded(card_points: int) -> int:
+    return (card_points + 5) // 10
+
+
+@dataclass(frozen=True)
+class DealScore:
+    made: bool | None  # None without a contract
+    scores: tuple[int, int]  # per team, in Team order
+
+
+def score_deal(memory: Memory, team_points: list[int], team_tricks: list[int]) -> DealScore:
+    # team_points and team_tricks per team in Team order, as TrickPlay keeps them
+    if memory.last_bet_amount is None:
+        return DealScore(None, (0, 0))
+    bidder = _TEAM_CODES[memory.last_bet_player.team]
+    defender = 1 - bidder
+    if memory.capo:
+        made = team_tricks[bidder] == TRICKS
+    else:
+        made = team_points[bidder] >= memory.last_bet_amount * 10
+    multiplier = 4 if memory.recontra else 2 if memory.contra else 1
+    scores = [0, 0]
+    scores[bidder if made else defender] = memory.last_bet_amount * multiplier
+    if multiplier == 1:
+        scores[defender] += rounded(team_points[defender])
+    return DealScore(made, (scores[0], scores[1]))
+
+
+def score_play(memory: Memory, play: TrickPlay) -> DealScore:
+    if not play.is_over:
+        raise ValueError("deal is not played out")
+    return score_deal(memory, play.team_points, play.team_tricks)
+
+
+def score_batch(bidder: np.ndarray,
+                amount: np.ndarray,
+                capo: np.ndarray,
+                contra: np.ndarray,
+                recontra: np.ndarray,
+                team_points: np.ndarray,
+                team_tricks: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Scores N deals in one pass, the same rules as score_deal. bidder is a player code,
+    # NONE with amount NONE for a redial; team_points and team_tricks are (N, 2) in Team order.
+    # Returns made (N,), False for redials, and scores (N, 2).
+    amount = np.asarray(amount, dtype=np.int32)
+    team_points = np.asarray(team_points, dtype=np.int32)
+    team_tricks = np.asarray(team_tricks, dtype=np.int32)
+    has_contract = amount != NONE
+    rows = np.arange(len(amount))
+    bidding_team = PLAYER_TEAMS[np.where(has_contract, bidder, 0)]
+    defending_team = 1 - bidding_team
+
+    made = np.where(
+        capo,
+        team_tricks[rows, bidding_team] == TRICKS,
+        team_points[rows, bidding_team] >= amount * 10,
+    ) & has_contract
+    multiplier = np.where(recontra, 4, np.where(contra, 2, 1))
+    value = np.where(has_contract, amount * multiplier, 0)
+
+    scores = np.zeros((len(amount), 2), dtype=np.int32)
+    winner = np.where(made, bidding_team, defending_team)
+    scores[rows, winner] = value
+    undoubled = has_contract & (multiplier == 1)
+    scores[rows, defending_team] += np.where(undoubled, (team_points[rows, defending_team] + 5) // 10, 0)
+    return made, scores
+
+
+def score_auctions(batch: BazarBatch,
+                   team_points: np.ndarray,
+                   team_tricks: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # every game of a finished BazarBatch with the outcome of its play
+    return score_batch(
+        batch.last_bet_player, batch.last_bet_amount, batch.capo, batch.contra, batch.recontra,
+        team_points, team_tricks,
+    )
+
+
+def encode_memories(memories: list[Memory]) -> tuple[np.ndarray, ...]:
+    # auction columns accepted by score_batch, e.g. from journaled or logged games
+    size = len(memories)
+    bidder = np.full(size, NONE, dtype=np.int8)
+    amount = np.full(size, NONE, dtype=np.int16)
+    capo = np.zeros(size, dtype=bool)
+    contra = np.zeros(size, dtype=bool)
+    recontra = np.zeros(size, dtype=bool)
+    for i, memory in enumerate(memories):
+        if memory.last_bet_amount is None:
+            continue
+        bidder[i] = PLAYER_CODES[memory.last_bet_player]
+        amount[i] = memory.last_bet_amount
+        capo[i] = memory.capo
+        contra[i] = memory.contra
+        recontra[i] = memory.recontra
+    return bidder, amount, capo, contra, recontra
@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import bisect
+import itertools
+import logging
+import multiprocessing
+import zlib
+from concurrent.futures import Future
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from threading import Lock, RLock, Thread
+from typing import Any, Callable, Literal
+
+import codec
+from bazar import BazarFSM, Player
+from common import Suit
+from fsm import Rejection
+from journal import Journal
+from tables import Table, TableRegistry, RECONTRA_TIMEOUT, check_table_id
+from timers import TimerWheel
+
+logger = logging.getLogger(__name__)
+
+RING_REPLICAS = 512  # virtual nodes per worker, fewer make the shares uneven
+CALL_TIMEOUT = 10  # seconds
+
+# messages from front to worker: (request id, method, table id, args)
+# messages from worker to front: (REPLY, request id, result) or (CHANGE, TableState)
+REPLY = 1
+CHANGE = 2
+_ACTIONS = {"bet", "pass_", "contra", "recontra"}
+
+
+class HashRing:
+    # consistent hashing: adding or removing a worker moves only the tables of its share of the ring
+    def __init__(self, nodes: int, replicas: int = RING_REPLICAS) -> None:
+        points = sorted((zlib.crc32(f"{node}:{replica}".encode()), node)
+                        for node in range(nodes) for replica in range(replicas))
+        self._keys = [key for key, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node(self, key: str) -> int:
+        i = bisect.bisect(self._keys, zlib.crc32(key.encode())) % len(self._keys)
+        return self._nodes[i]
+
+
+@dataclass
+class TableState:
+    # everything a view needs to render a table, small enough to send on every change
+    id: str
+    version: int
+    position: int  # codec.pack
+    player_said: dict[Player, tuple[str, int]]
+    waiting_player: Player | None
+    timer: bool
+
+    @classmethod
+    def of(cls, table: Table) -> TableState:
+        with table.lock:
+            return cls(
+                table.id,
+                table.version,
+                codec.pack_fsm(table.fsm),
+                dict(table.player_said),
+                table.waiting_player,
+                table.timer is not None,
+            )
+
+
+def _worker(conn: Connection, recontra_timeout: float, journal_directory: str | None,
+            inherited: list[Connection]) -> None:
+    # the fork copied the front's ends of this and the earlier workers' pipes, held open here they
+    # would keep those workers from seeing EOF when the front goes away
+    for other in inherited:
+        other.close()
+    send_lock = Lock()
+
+    def send(message: tuple) -> None:
+        with send_lock:
+            conn.send(message)
+
+    timers = TimerWheel()
+    journal = Journal(journal_directory) if journal_directory else None
+
+    def on_change(table: Table) -> None:
+        # only joined tables have a mirror in the front
+        if table.viewers > 0:
+            send((CHANGE, TableState.of(table)))
+
+    registry = TableRegistry(timers, recontra_timeout, on_change, journal=journal)
+    if journal is not None:
+        registry.restore(journal.recover())
+        journal.start(registry.values)
+    timers.start()
+
+    while True:
+        try:
+            request_id, method, table_id, args = conn.recv()
+        except EOFError:
+            break
+        if method == "stop":
+            send((REPLY, request_id, None))
+            break
+        try:
+            if method in _ACTIONS:
+                result = getattr(registry.get(table_id), method)(*args)
+            elif method == "state":
+                result = TableState.of(registry.get(table_id))
+            elif method == "join":
+                result = TableState.of(registry.join(table_id))
+            elif method == "leave":
+                registry.leave(registry.get(table_id))
+                result = None
+            elif method == "memory_usage":
+                result = registry.memory_usage()
+            else:
+                raise ValueError(f"unknown method: {method}")
+        except Exception as e:
+            logger.exception("Exception raised while handling %s on table %r", method, table_id)
+            result = e
+        send((REPLY, request_id, result))
+
+    timers.stop()
+    if journal is not None:
+        journal.close()
+
+
+class RemoteTable:
+    # Front-side mirror of a table owned by a worker. Reads come from the mirror,
+    # actions go to the owning worker, which pushes the new state back.
+    def __init__(self, registry: ShardedTableRegistry, table_id: str) -> None:
+        check_table_id(table_id)
+        self.id = table_id
+        self.lock = RLock()
+        self.fsm = BazarFSM(compiled=True)
+        self.version = -1
+        self.player_said: dict[Player, tuple[str, int]] = {p: ("", 0) for p in Player}
+        self.waiting_player: Player | None = Player.A
+        self.timer: bool | None = None
+        self.viewers = 0
+        self._registry = registry
+
+    def update(self, state: TableState) -> bool:
+        with self.lock:
+            if state.version <= self.version:
+                return False
+            self.version = state.version
+            self.fsm.current_state = codec.unpack_into(state.position, self.fsm.memory)
+            self.player_said = state.player_said
+            self.waiting_player = state.waiting_player
+            self.timer = True if state.timer else None
+            return True
+
+    def bet(self, player: Player, suit: Suit, amount: int, capo: bool) -> Literal[True] | Rejection:
+        return self._registry.call(self.id, "bet", player, suit, amount, capo)
+
+    def pass_(self, player: Player) -> Literal[True] | Rejection:
+        return self._registry.call(self.id, "pass_", player)
+
+    def contra(self, player: Player) -> Literal[True] | Rejection:
+        return self._registry.call(self.id, "contra", player)
+
+    def recontra(self, player: Player) -> Literal[True] | Rejection:
+        return self._registry.call(self.id, "recontra", player)
+
+
+class ShardedTableRegistry:
+    # Same interface as TableRegistry for views, but tables live in worker processes chosen by
+    # consistent hashing of the table id. Every worker owns its tables, timers and journal.
+    def __init__(self,
+                 workers: int,
+                 recontra_timeout: float = RECONTRA_TIMEOUT,
+                 on_change: Callable[[RemoteTable], None] = None,
+                 journal_directory: str = None) -> None:
+        self.on_change = on_change
+        self.ring = HashRing(workers)
+        self._mirrors: dict[str, RemoteTable] = {}
+        self._lock = Lock()
+        self._pending: dict[int, Future] = {}
+        self._request_ids = itertools.count()
+        self._connections: list[Connection] = []
+        self._send_locks: list[Lock] = []
+        self._processes = []
+        # fork: workers start without re-importing main.py and its lona app, and share the compiled
+        # RULES with the front copy-on-write
+        context = multiprocessing.get_context("fork")
+        for i in range(workers):
+            front, back = context.Pipe()
+            directory = None if journal_directory is None else f"{journal_directory}/worker-{i}"
+            fronts = [*self._connections, front]
+            process = context.Process(
+                target=_worker, args=(back, recontra_timeout, directory, fronts), name=f"TableWorker-{i}", daemon=True,
+            )
+            process.start()
+            back.close()
+            self._connections.append(front)
+            self._send_locks.append(Lock())
+            self._processes.append(process)
+            Thread(target=self._receive, args=(front,), name=f"TableWorkerReceiver-{i}", daemon=True).start()
+
+    def call_async(self, table_id: str, method: str, *args: Any) -> Future:
+        return self._send(self.ring.node(table_id), method, table_id, args)
+
+    def call(self, table_id: str, method: str, *args: Any) -> Any:
+        result = self.call_async(table_id, method, *args).result(CALL_TIMEOUT)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def get(self, table_id: str) -> RemoteTable:
+        # Workers push changes only for joined tables. A mirror nobody joined is fetched on every
+        # get, so it is current as of the call but doesn't follow later changes; join to follow them.
+        with self._lock:
+            mirror = self._mirror_under_lock(table_id)
+            joined = mirror.viewers > 0
+        if not joined:
+            mirror.update(self.call(table_id, "state"))
+        return mirror
+
+    def join(self, table_id: str) -> RemoteTable:
+        # counted in the same critical section that finds the mirror, so a concurrent leave
+        # can't drop it in between
+        with self._lock:
+            mirror = self._mirror_under_lock(table_id)
+            mirror.viewers += 1
+        mirror.update(self.call(table_id, "join"))
+        return mirror
+
+    def leave(self, table: RemoteTable) -> None:
+        # the mirror is dropped with its last viewer; whoever still holds it, e.g. from get,
+        # keeps the position it had, a later get or join makes a new one
+        with self._lock:
+            table.viewers -= 1
+            if table.viewers <= 0:
+                self._mirrors.pop(table.id, None)
+        self.call(table.id, "leave")
+
+    def _mirror_under_lock(self, table_id: str) -> RemoteTable:
+        mirror = self._mirrors.get(table_id)
+        if mirror is None:
+            mirror = self._mirrors[table_id] = RemoteTable(self, table_id)
+        return mirror
+
+    def values(self) -> list[RemoteTable]:
+        with self._lock:
+            return list(self._mirrors.values())
+
+    def memory_usage(self) -> dict[str, int]:
+        usage = {}
+        for worker in range(len(self._connections)):
+            usage.update(self._call_worker(worker, "memory_usage"))
+        return usage
+
+    def close(self) -> None:
+        for worker in range(len(self._connections)):
+            self._call_worker(worker, "stop")
+        for process in self._processes:
+            process.join()
+
+    def _call_worker(self, worker: int, method: str) -> Any:
+        return self._send(worker, method, "", ()).result(CALL_TIMEOUT)
+
+    def _send(self, worker: int, method: str, table_id: str, args: tuple) -> Future:
+        future: Future = Future()
+        with self._lock:
+            request_id = next(self._request_ids)
+            self._pending[request_id] = future
+        with self._send_locks[worker]:
+            self._connections[worker].send((request_id, method, table_id, args))
+        return future
+
+    def _receive(self, conn: Connection) -> None:
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                return
+            if message[0] == REPLY:
+                _, request_id, result = message
+                with self._lock:
+                    future = self._pending.pop(request_id, None)
+                if future is not None:
+                    future.set_result(result)
+            else:
+                state: TableState = message[1]
+                with self._lock:
+                    mirror = self._mirrors.get(state.id)
+                if mirror is not None and mirror.update(state) and self.on_change is not None:
+                    self.on_change(mirror)
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable
+
+from bazar import Player, State
+from broadcast import Broadcaster
+from tables import Table, TableRegistry
+
+logger = logging.getLogger(__name__)
+
+Watcher = Callable[["TableDisplay"], None]
+
+
+@dataclass(frozen=True)
+class TableDisplay:
+    # everything a spectator shows, shared read-only by every spectator of the table
+    version: int
+    said: dict[Player, tuple[str, int]]
+    waiting_player: Player | None
+    status: str
+
+
+def display_of(table: Table) -> TableDisplay:
+    with table.lock:
+        memory = table.fsm.memory
+        state = table.fsm.current_state
+        if memory.last_bet_amount is None:
+            status = "No bets yet"
+        else:
+            status = f"{memory.last_bet_player.value}: {memory.last_bet_suit.value}{memory.last_bet_amount}"
+            if memory.capo:
+                status += " capo"
+            if memory.recontra:
+                status += ", recontra"
+            elif memory.contra:
+                status += ", contra"
+        if state == State.REDIAL:
+            status = "Redial"
+        elif state == State.PLAY:
+            status += ", playing"
+        return TableDisplay(table.version, dict(table.player_said), table.waiting_player, status)
+
+
+class _Watched:
+    def __init__(self, table: Table, subscriber: Callable[[int], None]) -> None:
+        self.table = table
+        self.subscriber = subscriber
+        self.display = display_of(table)
+        self.watchers: dict[Watcher, None] = {}
+
+
+class SpectatorHub:
+    # A table's display is built once per broadcast, whatever the number of spectators,
+    # and handed to every watcher. The hub is the table's only viewer and broadcast subscriber.
+    def __init__(self, tables: TableRegistry, broadcaster: Broadcaster) -> None:
+        self.tables = tables
+        self.broadcaster = broadcaster
+        self.built = 0
+        self._watched: dict[str, _Watched] = {}
+        self._lock = Lock()
+
+    def watch(self, table_id: str, watcher: Watcher) -> TableDisplay:
+        with self._lock:
+            watched = self._watched.get(table_id)
+            if watched is None:
+                watched = self._watched[table_id] = _Watched(
+                    self.tables.join(table_id), lambda version: self._changed(table_id, version),
+                )
+                self.built += 1
+                self.broadcaster.subscribe(table_id, watched.subscriber)
+            watched.watchers[watcher] = None
+            return watched.display
+
+    def unwatch(self, table_id: str, watcher: Watcher) -> None:
+        with self._lock:
+            watched = self._watched.get(table_id)
+            if watched is None:
+                return
+            watched.watchers.pop(watcher, None)
+            if watched.watchers:
+                return
+            del self._watched[table_id]
+        self.broadcaster.unsubscribe(table_id, watched.subscriber)
+        self.tables.leave(watched.table)
+
+    def watchers(self, table_id: str) -> int:
+        with self._lock:
+            watched = self._watched.get(table_id)
+            return 0 if watched is None else len(watched.watchers)
+
+    def _changed(self, table_id: str, version: int) -> None:
+        with self._lock:
+            watched = self._watched.get(table_id)
+            if watched is None or version <= watched.display.version:
+                return
+            watched.display = display = display_of(watched.table)
+            self.built += 1
+            watchers = list(watched.watchers)
+        for watcher in watchers:
+            try:
+                watcher(display)
+            except Exception:
+                logger.exception("Exception raised while showing table %r to %s", table_id, watcher)
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import time
+from threading import Lock, RLock
+from typing import Callable, Literal
+
+import codec
+from bazar import RULES, BazarFSM, Event, EventData, Memory, Player, State
+from common import Suit, deep_sizeof
+from fsm import Rejection
+from journal import MAX_TABLE_ID_BYTES, Journal
+from timers import TimerWheel, Timeout
+
+RECONTRA_TIMEOUT = 10  # seconds
+TABLE_MAX_IDLE = 30 * 60  # seconds
+EVICTION_INTERVAL = 60  # seconds
+
+
+def check_table_id(table_id: str) -> None:
+    # ids come from URLs; one the journal can't record must not get a table at all, its first
+    # accepted event would fail to journal and so would every snapshot after it
+    if len(table_id.encode()) > MAX_TABLE_ID_BYTES:
+        raise ValueError(f"table id longer than {MAX_TABLE_ID_BYTES} bytes")
+
+
+def shared_objects() -> set[int]:
+    # ids of everything reachable from the rules every BazarFSM references
+    seen: set[int] = set()
+    deep_sizeof(RULES, seen)
+    return seen
+
+
+class Table:
+    # Every check-and-apply on the FSM happens under the table lock, so player actions
+    # and the recontra timeout can't interleave. Tables don't share locks.
+    def __init__(self,
+                 table_id: str,
+                 timers: TimerWheel,
+                 recontra_timeout: float = RECONTRA_TIMEOUT,
+                 on_change: Callable[[Table], None] = None,
+                 journal: Journal = None) -> None:
+        check_table_id(table_id)
+        self.id = table_id
+        self.timers = timers
+        self.recontra_timeout = recontra_timeout
+        self.on_change = on_change
+        self.journal = journal
+        self.lock = RLock()
+        self.fsm = BazarFSM(compiled=True)
+        self.timer: Timeout | None = None
+        self.player_said: dict[Player, tuple[str, int]] = {p: ("", 0) for p in Player}
+        self.waiting_player: Player | None = Player.A
+        self.viewers = 0
+        self.version = 0  # incremented on every accepted action
+        self.last_activity = time.monotonic()
+
+    def touch(self) -> None:
+        self.last_activity = time.monotonic()
+
+    def memory_usage(self, shared: set[int] = None) -> int:
+        # timer wheel, journal and bazar rules are shared by every table; shared are ids of
+        # objects reachable from the rules, from shared_objects()
+        return deep_sizeof(self, {id(self.timers), id(self.journal), *(shared or shared_objects())})
+
+    def restore(self, version: int, state: State, memory: Memory) -> None:
+        # puts table into recovered position, what players said before is lost
+        with self.lock:
+            self._cancel_timer_under_lock()
+            self.fsm.memory = memory
+            self.fsm.current_state = state
+            self.version = version
+            if state == State.CONTRA:
+                self.timer = self.timers.schedule(self.recontra_timeout, self.timeout)
+            if self.fsm.is_terminal or state == State.CONTRA:
+                self.waiting_player = None
+            else:
+                self.waiting_player = memory.current_player
+        self._changed()
+
+    def bet(self, player: Player, suit: Suit, amount: int, capo: bool) -> Literal[True] | Rejection:
+        with self.lock:
+            event = Event.CAPO_BET if capo else Event.BET
+            result = self._apply_under_lock(event, EventData(player=player, suit=suit, amount=amount))
+            if not result:
+                return result
+            if capo:
+                self._say(player, f"{suit.value}{amount}<sup>cp</sup>")
+            else:
+                self._say(player, f"{suit.value}{amount}")
+            self.waiting_player = self.fsm.memory.current_player
+        self._changed()
+        return True
+
+    def pass_(self, player: Player) -> Literal[True] | Rejection:
+        with self.lock:
+            result = self._apply_under_lock(Event.PASS, EventData(player=player))
+            if not result:
+                return result
+            self._say(player, "Pass")
+            if self.fsm.is_terminal:
+                self.waiting_player = None
+            else:
+                self.waiting_player = self.fsm.memory.current_player
+        self._changed()
+        return True
+
+    def contra(self, player: Player) -> Literal[True] | Rejection:
+        with self.lock:
+            result = self._apply_under_lock(Event.CONTRA, EventData(player=player))
+            if not result:
+                return result
+            self.timer = self.timers.schedule(self.recontra_timeout, self.timeout)
+            self._say(player, "Contra")
+            self.waiting_player = None
+        self._changed()
+        return True
+
+    def recontra(self, player: Player) -> Literal[True] | Rejection:
+        with self.lock:
+            result = self._apply_under_lock(Event.RECONTRA, EventData(player=player))
+            if not result:
+                return result
+            self._cancel_timer_under_lock()
+            self._say(player, "Recontra")
+            self.waiting_player = None
+        self._changed()
+        return True
+
+    def timeout(self) -> Literal[True] | Rejection:
+        with self.lock:
+            result = self._apply_under_lock(Event.TIMEOUT, EventData())
+            if not result:
+                return result
+            self.timer = None
+        self._changed()
+        return True
+
+    def close(self) -> None:
+        with self.lock:
+            self._cancel_timer_under_lock()
+
+    def _apply_under_lock(self, event: Event, data: EventData) -> Literal[True] | Rejection:
+        # encoded before the FSM moves: an event the codec can't hold, e.g. a bet over
+        # codec.MAX_AMOUNT, raises ValueError and leaves the table as it was
+        packed = codec.pack_event(event, data)
+        result = self.fsm.try_handle_event(event, data)
+        if not result:
+            return result
+        self.version += 1
+        if self.journal is not None:
+            self.journal.append(self.id, self.version, packed)
+        return True
+
+    def _say(self, player: Player, text: str) -> None:
+        self.player_said[player] = (text, self.player_said[player][1] + 1)
+
+    def _cancel_timer_under_lock(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+    def _changed(self) -> None:
+        self.touch()
+        if self.on_change is not None:
+            self.on_change(self)
+
+
+class TableRegistry:
+    # Tables are created on first access and evicted once nobody watches them for max_idle seconds.
+    def __init__(self,
+                 timers: TimerWheel,
+                 recontra_timeout: float = RECONTRA_TIMEOUT,
+                 on_change: Callable[[Table], None] = None,
+                 max_idle: float = TABLE_MAX_IDLE,
+                 eviction_interval: float = EVICTION_INTERVAL,
+                 journal: Journal = None) -> None:
+        self.timers = timers
+        self.recontra_timeout = recontra_timeout
+        self.on_change = on_change
+        self.journal = journal
+        self.max_idle = max_idle
+        self.eviction_interval = eviction_interval
+        self._tables: dict[str, Table] = {}
+        self._lock = Lock()
+        self._next_eviction = time.monotonic() + eviction_interval
+
+    def __len__(self) -> int:
+        return len(self._tables)
+
+    def __contains__(self, table_id: str) -> bool:
+        return table_id in self._tables
+
+    def get(self, table_id: str) -> Table:
+        with self._lock:
+            return self._get_under_lock(table_id)
+
+    def join(self, table_id: str) -> Table:
+        with self._lock:
+            table = self._get_under_lock(table_id)
+            table.viewers += 1
+            return table
+
+    def leave(self, table: Table) -> None:
+        with self._lock:
+            table.viewers -= 1
+            table.touch()
+
+    def values(self) -> list[Table]:
+        with self._lock:
+            return list(self._tables.values())
+
+    def restore(self, recovered: dict[str, tuple[int, BazarFSM]]) -> None:
+        for table_id, (version, fsm) in recovered.items():
+            self.get(table_id).restore(version, fsm.current_state, fsm.memory)
+
+    def evict_idle(self) -> list[str]:
+        with self._lock:
+            return self._evict_idle_under_lock(time.monotonic())
+
+    def memory_usage(self) -> dict[str, int]:
+        with self._lock:
+            tables = list(self._tables.values())
+        shared = shared_objects()
+        return {t.id: t.memory_usage(shared) for t in tables}
+
+    def _get_under_lock(self, table_id: str) -> Table:
+        now = time.monotonic()
+        if now >= self._next_eviction:
+            self._evict_idle_under_lock(now)
+        table = self._tables.get(table_id)
+        if table is None:
+            table = self._tables[table_id] = Table(
+                table_id, self.timers, self.recontra_timeout, self.on_change, self.journal,
+            )
+        table.touch()
+        return table
+
+    def _evict_idle_under_lock(self, now: float) -> list[str]:
+        self._next_eviction = now + self.eviction_interval
+        evicted = [
+            table_id for table_id, table in self._tables.items()
+            if table.viewers <= 0 and now - table.last_activity >= self.max_idle
+        ]
+        for table_id in evicted:
+            self._tables.pop(table_id).close()
+        return evicted
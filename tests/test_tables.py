@@ -0,0 +1,43 @@
+import tempfile
+import unittest
+
+from bazar import Player, State
+from common import Suit
+from journal import MAX_TABLE_ID_BYTES, Journal
+from tables import Table, TableRegistry
+from timers import ManualClock, TimerWheel
+
+
+class TableIdTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.journal = Journal(self.directory.name)
+        self.registry = TableRegistry(TimerWheel(clock=ManualClock()), journal=self.journal)
+
+    def tearDown(self) -> None:
+        self.journal.close()
+        self.directory.cleanup()
+
+    def test_over_long_id_gets_no_table(self) -> None:
+        too_long = "t" * (MAX_TABLE_ID_BYTES + 1)
+        with self.assertRaises(ValueError):
+            self.registry.join(too_long)
+        with self.assertRaises(ValueError):
+            self.registry.get("é" * (MAX_TABLE_ID_BYTES // 2 + 1))  # two bytes per character
+        with self.assertRaises(ValueError):
+            Table(too_long, self.registry.timers)
+        self.assertEqual(len(self.registry), 0)
+
+    def test_longest_id_is_journaled_and_snapshotted(self) -> None:
+        table_id = "t" * MAX_TABLE_ID_BYTES
+        table = self.registry.join(table_id)
+        self.assertTrue(table.bet(Player.A, Suit.SPADES, 8, False))
+        self.journal.snapshot(self.registry.values())
+        self.journal.close()
+        version, fsm = Journal(self.directory.name).recover()[table_id]
+        self.assertEqual(version, 1)
+        self.assertEqual(fsm.current_state, State.BET)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+
+from bazar import Player, State
+from common import Suit
+from tables import Table
+from timers import ManualClock, TimerWheel
+
+
+class TimerWheelTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.clock = ManualClock()
+        self.timers = TimerWheel(tick=0.1, slots=8, clock=self.clock)
+        self.fired: list[str] = []
+
+    def test_fires_when_due(self) -> None:
+        self.timers.schedule(0.5, lambda: self.fired.append("a"))
+        self.clock.advance(0.4)
+        self.assertEqual(self.timers.run_pending(), 0)
+        self.clock.advance(0.1)
+        self.assertEqual(self.timers.run_pending(), 1)
+        self.assertEqual(self.fired, ["a"])
+        self.assertEqual(len(self.timers), 0)
+
+    def test_cancelled_never_fires(self) -> None:
+        timeout = self.timers.schedule(0.3, lambda: self.fired.append("a"))
+        self.timers.schedule(0.3, lambda: self.fired.append("b"))
+        timeout.cancel()
+        self.clock.advance(1)
+        self.assertEqual(self.timers.run_pending(), 1)
+        self.assertEqual(self.fired, ["b"])
+
+    def test_longer_than_one_revolution(self) -> None:
+        # 8 slots of 0.1s, a 2s timeout passes its slot twice before it is due
+        self.timers.schedule(2, lambda: self.fired.append("a"))
+        for _ in range(19):
+            self.clock.advance(0.1)
+            self.timers.run_pending()
+        self.assertEqual(self.fired, [])
+        self.clock.advance(0.1)
+        self.timers.run_pending()
+        self.assertEqual(self.fired, ["a"])
+
+    def test_late_run_fires_everything_due(self) -> None:
+        for delay in (0.1, 0.5, 3):
+            self.timers.schedule(delay, lambda delay=delay: self.fired.append(delay))
+        self.clock.advance(10)
+        self.assertEqual(self.timers.run_pending(), 3)
+        self.assertEqual(sorted(self.fired), [0.1, 0.5, 3])
+
+
+class RecontraTimeoutTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.clock = ManualClock()
+        self.timers = TimerWheel(clock=self.clock)
+        self.table = Table("test", self.timers, recontra_timeout=10)
+        self.assertTrue(self.table.bet(Player.A, Suit.SPADES, 8, False))
+        self.assertTrue(self.table.contra(Player.B))
+        self.assertEqual(self.table.fsm.current_state, State.CONTRA)
+
+    def test_timeout_ends_auction(self) -> None:
+        self.clock.advance(9.9)
+        self.timers.run_pending()
+        self.assertEqual(self.table.fsm.current_state, State.CONTRA)
+        self.clock.advance(0.1)
+        self.assertEqual(self.timers.run_pending(), 1)
+        self.assertTrue(self.table.fsm.is_terminal)
+        self.assertFalse(self.table.fsm.memory.recontra)
+        self.assertIsNone(self.table.timer)
+
+    def test_recontra_cancels_timeout(self) -> None:
+        self.clock.advance(5)
+        self.timers.run_pending()
+        self.assertTrue(self.table.recontra(Player.A))
+        self.assertEqual(len(self.timers), 0)
+        version = self.table.version
+        self.clock.advance(10)
+        self.assertEqual(self.timers.run_pending(), 0)
+        self.assertTrue(self.table.fsm.memory.recontra)
+        self.assertEqual(self.table.version, version)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import logging
+import math
+import time
+from threading import Event, Lock, Thread
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+TICK = 0.1  # seconds
+SLOTS = 512
+
+
+class MonotonicClock:
+    def now(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+
+class ManualClock:
+    # for tests: time moves only by advance(), so timeouts don't need real sleeps
+    def __init__(self, now: float = 0) -> None:
+        self._now = now
+
+    def now(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float) -> None:
+        self.advance(seconds)
+
+    def advance(self, seconds: float) -> None:
+        self._now += seconds
+
+
+class Timeout:
+    def __init__(self, wheel: TimerWheel, deadline: int, callback: Callable[[], None]) -> None:
+        self.wheel = wheel
+        self.deadline = deadline  # in ticks
+        self.callback = callback
+
+    def cancel(self) -> None:
+        self.wheel.cancel(self)
+
+
+class TimerWheel:
+    # Hashed timing wheel: timeout lives in slot deadline % slots, so schedule and cancel are O(1).
+    # Timeouts longer than one revolution stay in their slot until the deadline tick comes round.
+    def __init__(self, tick: float = TICK, slots: int = SLOTS, clock: MonotonicClock | ManualClock = None) -> None:
+        self.tick = tick
+        self.clock = clock or MonotonicClock()
+        self._start = self.clock.now()
+        self._current = 0  # last processed tick
+        self._slots: list[dict[Timeout, None]] = [{} for _ in range(slots)]
+        self._lock = Lock()
+        self._stopped = Event()
+        self._thread: Thread | None = None
+
+    def __len__(self) -> int:
+        return sum(map(len, self._slots))
+
+    def schedule(self, delay: float, callback: Callable[[], None]) -> Timeout:
+        with self._lock:
+            deadline = max(self._current + 1, math.ceil((self.clock.now() - self._start + delay) / self.tick))
+            timeout = Timeout(self, deadline, callback)
+            self._slots[timeout.deadline % len(self._slots)][timeout] = None
+            return timeout
+
+    def cancel(self, timeout: Timeout) -> None:
+        with self._lock:
+            self._slots[timeout.deadline % len(self._slots)].pop(timeout, None)
+
+    def run_pending(self) -> int:
+        # fires every timeout whose deadline has passed, returns number of fired timeouts
+        with self._lock:
+            now = math.floor((self.clock.now() - self._start) / self.tick)
+            due = []
+            first = max(self._current + 1, now - len(self._slots) + 1)
+            for tick in range(first, now + 1):
+                slot = self._slots[tick % len(self._slots)]
+                for timeout in [t for t in slot if t.deadline <= now]:
+                    del slot[timeout]
+                    due.append(timeout)
+            self._current = max(self._current, now)
+        for timeout in due:
+            try:
+                timeout.callback()
+            except Exception:
+                logger.exception("Exception raised while running timer callback %s", timeout.callback)
+        return len(due)
+
+    def start(self) -> None:
+        self._thread = Thread(target=self._run, name="TimerWheel", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self.clock.sleep(self.tick)
+            self.run_pending()
@@ -5,9 +5,11 @@ from lona.html import Span, Widget, Div, Label, Button
 from lona.static_files import StyleSheet
 
 from bazar import MIN_BET, MIN_CAPO_BET
+from codec import MAX_AMOUNT
 from common import Suit
 from elements.radio_button import RadioButton
 from elements.radio_group import RadioGroup
+from elements.static_node import Template
 from elements.toggle_button import ToggleButton
 
 
@@ -30,6 +32,10 @@ class CssClass:
     START_TIMER = "start-timer"
 
 
+SUIT_ORDER = [Suit.SPADES, Suit.HEARTS, Suit.CLUBS, Suit.DIAMONDS, Suit.NONE]
+SUIT_LABELS = {suit: Template(Span(suit.value)) for suit in SUIT_ORDER}
+
+
 class BetWidget(Widget):
     STATIC_FILES = [
         StyleSheet("bet_widget.css", "bet_widget.css")
@@ -54,11 +60,7 @@ class BetWidget(Widget):
         self._amount = Span("0", _class=CssClass.AMOUNT)
         self._capo = ToggleButton("Capo", _class=CssClass.CAPO, handle_click=self._handle_capo)
         self._suit = RadioGroup(name="suit", handle_change=self._handle_suit, nodes=[
-            Label(RadioButton(value=Suit.SPADES.value), Span(Suit.SPADES.value)),
-            Label(RadioButton(value=Suit.HEARTS.value), Span(Suit.HEARTS.value)),
-            Label(RadioButton(value=Suit.CLUBS.value), Span(Suit.CLUBS.value)),
-            Label(RadioButton(value=Suit.DIAMONDS.value), Span(Suit.DIAMONDS.value)),
-            Label(RadioButton(value=Suit.NONE.value), Span(Suit.NONE.value)),
+            Label(RadioButton(value=suit.value), SUIT_LABELS[suit]()) for suit in SUIT_ORDER
         ])
         self._bet = Button("Bet", _class=CssClass.BET, disabled=True, handle_click=self.handle_bet)
         self._contra = Button("Contra", _class=CssClass.CONTRA, handle_click=self.handle_contra)
@@ -149,7 +151,8 @@ class BetWidget(Widget):
 
     def _handle_plus(self, event: InputEvent) -> None:
         with self.lock:
-            self.amount += 1
+            if self.amount < MAX_AMOUNT:
+                self.amount += 1
 
     def _handle_minus(self, event: InputEvent) -> None:
         with self.lock:
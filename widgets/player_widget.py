@@ -1,7 +1,10 @@
+from functools import lru_cache
+
 from lona.html import Widget, Div, HTML
 from lona.static_files import StyleSheet
 
 from common import Location
+from elements.static_node import Template
 
 
 class CssClass:
@@ -20,22 +23,29 @@ class CssClass:
     }
 
 
+IMAGE = Template(Div("👤", _class=CssClass.IMAGE))
+
+
+@lru_cache(maxsize=256)
+def name_template(name: str) -> Template:
+    # every view shows the same few player names
+    return Template(Div(name, _class=CssClass.NAME))
+
+
 class PlayerWidget(Widget):
     STATIC_FILES = [
         StyleSheet("player_widget.css", "player_widget.css")
     ]
 
     def __init__(self, name: str = "", location: Location = Location.TOP, first: bool = False) -> None:
-        self._name = Div(name, _class=CssClass.NAME)
+        self._name = name_template(name)()
         # two elements is necessary to "repeat" animation without js
         self._said_a = Div(_class=CssClass.BUBBLE)
         self._said_b = Div(_class=CssClass.BUBBLE)
         self._using_a = False
         self._text_number = 0
         self._container = Div(_class=CssClass.PLAYER_WIDGET, nodes=[
-            Div(_class=CssClass.IMAGE, nodes=[
-                "👤",
-            ]),
+            IMAGE(),
             self._name,
             self._said_a,
             self._said_b,
@@ -45,7 +55,10 @@ class PlayerWidget(Widget):
         self.nodes = [self._container]
 
     def change_name(self, name: str) -> None:
-        self._name.set_text(name)
+        with self.lock:
+            node = name_template(name)()
+            self._container.nodes[self._container.nodes.index(self._name)] = node
+            self._name = node
 
     def change_location(self, location: Location) -> None:
         with self.lock: